@@ -0,0 +1,247 @@
+"""Builds the downloadable archives of job output.
+
+Notes
+-----
+Only the files listed in the archive manifest are archived, so the per
+model structures, BUDE sequence files and the shared BUDE libraries, which
+are the same for every job, are left out. The manifest is a JSON object
+with three lists of glob patterns, relative to the job's directory:
+
+* `include`: files that are added to the archive.
+* `exclude`: files that are never added, even if they match `include`.
+* `stream`: files that are written once and can be added as soon as they
+  have stopped changing, while the scan is still running.
+
+The default manifest is `DEFAULT_MANIFEST`, a different one can be given
+with the `ARCHIVE_MANIFEST` environment variable. The archive format is set
+with `ARCHIVE_CODEC`:
+
+* `store`: an uncompressed zip archive.
+* `deflate`: a zip archive compressed with deflate, the default.
+* `zstd`: a tar archive compressed with Zstandard, which needs the
+  `zstandard` package.
+
+`ARCHIVE_LEVEL` sets the compression level. Zip archives can be reopened
+to add more files, so they are built while the scan runs and finished by
+the post-processing workers. Zstandard archives are built in one pass when
+the job has finished.
+"""
+
+import glob
+import json
+import os
+import sys
+import tarfile
+import time
+import zipfile
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Chimera scripts are only written by budeScan, jobs without rotamer correction
+# are scanned with NumPy by default, see `budeAlaScan.bude.energy`, and have none
+DEFAULT_MANIFEST = {
+    "include": [
+        "*.pdb",
+        "alaScan/results/*",
+        "alaScan/mutations_rslt/**/*",
+        "alaScan/chimeraScripts/*",
+        "replot/*",
+    ],
+    "exclude": ["alaScan/libs/**", "alaScan/*.bctl"],
+    "stream": ["*.pdb", "alaScan/results/*.bals", "alaScan/mutations_rslt/**/*.bals"],
+}
+CODECS = ("store", "deflate", "zstd")
+DEFAULT_LEVELS = {"store": None, "deflate": 6, "zstd": 3}
+# Files that are streamed must not have been modified for this long
+SETTLE_SECONDS = 5.0
+
+
+def load_manifest(manifest_path=None):
+    """Loads an archive manifest, falling back to `DEFAULT_MANIFEST`."""
+    manifest_path = manifest_path or os.environ.get("ARCHIVE_MANIFEST")
+    if not manifest_path:
+        return DEFAULT_MANIFEST
+    with open(manifest_path) as inf:
+        manifest = json.load(inf)
+    return {key: manifest.get(key, []) for key in DEFAULT_MANIFEST}
+
+
+def settings_from_env():
+    """Reads the archive codec and compression level from the environment.
+
+    Returns
+    -------
+    codec : str
+        One of `CODECS`, `zstd` is replaced by `deflate` if the
+        `zstandard` package is not installed.
+    level : int or None
+        Compression level, `None` if the codec has no levels.
+    """
+    codec = os.environ.get("ARCHIVE_CODEC", "deflate").lower()
+    if codec not in CODECS:
+        raise ValueError(f"ARCHIVE_CODEC must be one of {CODECS}, not {codec!r}.")
+    if codec == "zstd" and zstandard is None:
+        print(
+            "ARCHIVE_CODEC is zstd but zstandard is not installed, using deflate.",
+            file=sys.stderr,
+        )
+        codec = "deflate"
+    level = os.environ.get("ARCHIVE_LEVEL")
+    level = int(level) if level else DEFAULT_LEVELS[codec]
+    return codec, level
+
+
+def archive_file_name(job_id, codec):
+    """Name of the archive of a job in the result files directory."""
+    extension = "tar.zst" if codec == "zstd" else "zip"
+    return f"{job_id}.{extension}"
+
+
+class ArchiveBuilder:
+    """Adds the files in a job's directory to its archive.
+
+    Parameters
+    ----------
+    work_dir : str
+        Directory the job was run in.
+    archive_dir : str or pathlib.Path
+        Directory the finished archive is moved to.
+    job_id : bson.objectid.ObjectId or str
+        ID of the job, used to name the archive.
+    codec : str
+        Archive format, one of `CODECS`.
+    level : int or None
+        Compression level.
+    manifest : dict, optional
+        Archive manifest, see the module notes.
+    """
+
+    def __init__(self, work_dir, archive_dir, job_id, codec, level, manifest=None):
+        self.work_dir = os.path.abspath(work_dir)
+        self.codec = codec
+        self.level = level
+        self.manifest = manifest or DEFAULT_MANIFEST
+        self.final_path = os.path.join(
+            str(archive_dir), archive_file_name(job_id, codec)
+        )
+        # The archive is built under a hidden name and renamed, so a
+        # partial archive is never served.
+        self.partial_path = os.path.join(
+            str(archive_dir), f".{archive_file_name(job_id, codec)}.partial"
+        )
+        self._archive = None
+        self._zstd_writer = None
+        self._added = set()
+
+    @property
+    def can_stream(self):
+        """Zip archives can be reopened, so they can be built in stages."""
+        return self.codec != "zstd"
+
+    def _matching(self, patterns):
+        paths = set()
+        for pattern in patterns:
+            paths.update(
+                os.path.relpath(path, self.work_dir)
+                for path in glob.glob(
+                    os.path.join(self.work_dir, pattern), recursive=True
+                )
+                if os.path.isfile(path)
+            )
+        return paths
+
+    def _open(self):
+        if self._archive is not None:
+            return
+        if self.codec == "zstd":
+            compressor = zstandard.ZstdCompressor(level=self.level)
+            self._zstd_writer = compressor.stream_writer(open(self.partial_path, "wb"))
+            self._archive = tarfile.open(fileobj=self._zstd_writer, mode="w|")
+            return
+        compression = (
+            zipfile.ZIP_STORED if self.codec == "store" else zipfile.ZIP_DEFLATED
+        )
+        kwargs = {}
+        # The compression level can only be set from Python 3.7
+        if self.codec == "deflate" and sys.version_info >= (3, 7):
+            kwargs["compresslevel"] = self.level
+        mode = "a" if os.path.exists(self.partial_path) else "w"
+        self._archive = zipfile.ZipFile(
+            self.partial_path, mode, compression=compression, **kwargs
+        )
+        self._added.update(self._archive.namelist())
+
+    def _add(self, rel_path):
+        path = os.path.join(self.work_dir, rel_path)
+        if self.codec == "zstd":
+            self._archive.add(path, arcname=rel_path, recursive=False)
+        else:
+            self._archive.write(path, arcname=rel_path)
+        self._added.add(rel_path)
+
+    def add_new_files(self, streamed_only=False):
+        """Adds the files in the manifest that are not in the archive yet.
+
+        Parameters
+        ----------
+        streamed_only : bool
+            Only add files that match the `stream` patterns and have not
+            been modified for `SETTLE_SECONDS`. This is used while the scan
+            is running.
+
+        Returns
+        -------
+        added : int
+            The number of files added.
+        """
+        if streamed_only and not self.can_stream:
+            return 0
+        self._open()
+        rel_paths = self._matching(self.manifest["include"])
+        rel_paths -= self._matching(self.manifest["exclude"])
+        if streamed_only:
+            rel_paths &= self._matching(self.manifest["stream"])
+            settled_before = time.time() - SETTLE_SECONDS
+            rel_paths = {
+                rel_path
+                for rel_path in rel_paths
+                if os.path.getmtime(os.path.join(self.work_dir, rel_path))
+                < settled_before
+            }
+        new_paths = sorted(rel_paths - self._added)
+        for rel_path in new_paths:
+            self._add(rel_path)
+        return len(new_paths)
+
+    def close(self):
+        """Closes the partial archive, so it can be reopened later."""
+        if self._archive is not None:
+            self._archive.close()
+            if self._zstd_writer is not None:
+                self._zstd_writer.close()
+        self._archive = None
+        self._zstd_writer = None
+        return
+
+    def finish(self):
+        """Adds any remaining files and moves the archive into place.
+
+        Returns
+        -------
+        file_name : str
+            Name of the archive in `archive_dir`.
+        """
+        self.add_new_files()
+        self.close()
+        os.replace(self.partial_path, self.final_path)
+        return os.path.basename(self.final_path)
+
+    def discard(self):
+        """Closes and removes the partial archive."""
+        self.close()
+        if os.path.exists(self.partial_path):
+            os.remove(self.partial_path)
+        return
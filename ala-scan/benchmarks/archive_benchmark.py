@@ -0,0 +1,96 @@
+"""Compares the time taken to build job archives and their sizes.
+
+Notes
+-----
+The old archive, a zip of the whole job directory made with
+`shutil.make_archive`, is compared with archives made by
+`archives.ArchiveBuilder` using the manifest and each codec and level.
+The benchmark needs the directory of a finished job, for example one made
+by running `budeAlaScan.py` by hand, then run::
+
+    python benchmarks/archive_benchmark.py /tmp/tmpab12cd34
+
+Use `--json` to get machine readable output.
+"""
+
+import argparse
+import json
+import os
+import pathlib
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).parents[1]))
+
+import archives  # noqa: E402
+
+SETTINGS = [
+    ("store", None),
+    ("deflate", 1),
+    ("deflate", 6),
+    ("deflate", 9),
+    ("zstd", 1),
+    ("zstd", 3),
+    ("zstd", 10),
+]
+
+
+def main():
+    """Builds an archive with each setting and prints a summary."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("job_dir", help="Directory of a finished job.")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--manifest", default=None, help="Archive manifest JSON.")
+    parser.add_argument("--json", action="store_true", help="Output JSON.")
+    args = parser.parse_args()
+
+    manifest = archives.load_manifest(args.manifest)
+    out_dir = tempfile.mkdtemp()
+    rows = [time_settings(args.job_dir, out_dir, None, None, manifest, args.repeats)]
+    for codec, level in SETTINGS:
+        if codec == "zstd" and archives.zstandard is None:
+            continue
+        rows.append(
+            time_settings(args.job_dir, out_dir, codec, level, manifest, args.repeats)
+        )
+    shutil.rmtree(out_dir)
+    if args.json:
+        print(json.dumps(rows))
+        return
+    print(f"{'archive':22} {'files':>7} {'size KB':>10} {'build s':>10} {'ratio':>7}")
+    baseline = rows[0]["bytes"]
+    for row in rows:
+        print(
+            f"{row['name']:22} {row['files']:7d} {row['bytes'] / 1024:10.1f} "
+            f"{row['seconds']:10.3f} {row['bytes'] / baseline:7.2f}"
+        )
+    return
+
+
+def time_settings(job_dir, out_dir, codec, level, manifest, repeats):
+    """Builds an archive `repeats` times and returns the fastest build."""
+    times = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        if codec is None:
+            path = shutil.make_archive(
+                os.path.join(out_dir, f"whole-{i}"), "zip", job_dir
+            )
+            files = sum(len(names) for (_, _, names) in os.walk(job_dir))
+        else:
+            builder = archives.ArchiveBuilder(
+                job_dir, out_dir, f"job-{i}", codec, level, manifest
+            )
+            files = builder.add_new_files()
+            path = os.path.join(out_dir, builder.finish())
+        times.append(time.perf_counter() - start)
+        size = os.path.getsize(path)
+        os.remove(path)
+    name = "whole dir (old)" if codec is None else f"{codec} {level or ''}".strip()
+    return {"name": name, "files": files, "bytes": size, "seconds": min(times)}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compares the wall time of running the BUDE pairs one by one or concurrently.
+
+Notes
+-----
+BUDE scores one receptor-ligand pair per run, so a multi-model structure
+needs a run per model and a constellation scan a run per model of every
+mutant. `run_bude_commands` runs these pairs as separate processes, as
+many at a time as the scan's core budget allows. This benchmark scans a
+multi-model structure with each core budget and checks that the results
+match the serial run. The Scwrl repack cache is turned off, so every scan
+does the same work. It must be run where `budeAlaScan` is installed, for
+example::
+
+    python benchmarks/bude_pairs_benchmark.py 2mzs.pdb -r A -l B --cores 1 2 4
+    python benchmarks/bude_pairs_benchmark.py 2mzs.pdb -r A -l B --mode auto
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+
+def main():
+    """Times a scan with each core budget and prints a summary."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdb", help="Multi-model PDB file.")
+    parser.add_argument("-r", "--receptor", nargs="+", default=["A"])
+    parser.add_argument("-l", "--ligand", nargs="+", default=["B"])
+    parser.add_argument("--mode", default="scan", choices=["scan", "auto"])
+    parser.add_argument("--cores", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+
+    from budeAlaScan import api, config
+
+    config.cfg.set(config.dir_sect, config.dir_repack_cache_opt, "")
+    pdb_path = os.path.abspath(args.pdb)
+    rows = []
+    baseline = None
+    for cores in args.cores:
+        times = []
+        for _ in range(args.repeats):
+            work_dir = tempfile.mkdtemp()
+            start = time.perf_counter()
+            results = api.run_scan(
+                pdb_path,
+                args.receptor,
+                args.ligand,
+                mode=args.mode,
+                work_dir=work_dir,
+                write_files=False,
+                cores=cores,
+            )
+            times.append(time.perf_counter() - start)
+            shutil.rmtree(work_dir)
+        if baseline is None:
+            baseline = results
+        rows.append((cores, min(times), results == baseline))
+    print(f"{'cores':>5} {'wall s':>10} {'speed up':>9} {'same results':>13}")
+    for cores, seconds, same in rows:
+        print(f"{cores:5d} {seconds:10.2f} {rows[0][1] / seconds:9.2f} {str(same):>13}")
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""Validates the NumPy BUDE energies against budeScan and times both.
+
+Notes
+-----
+Without rotamer correction (`-a 00`) the ddGs can be computed by
+`budeAlaScan.bude.energy` instead of the budeScan executable, see the
+`EnergyEvaluator` option in the `General` section of the ini file. This
+script splits the first model of each structure into a receptor and a
+ligand, scores the pair with both and compares every column of the .bals
+files. It exits with an error if any value differs by more than the
+tolerance, the values are printed with 4 decimals. It must be run where
+`budeAlaScan` and budeScan are installed, for example::
+
+    python benchmarks/energy_validation.py ../web/tests_data/1ycr.pdb ../web/tests_data/1l8c.pdb
+    python benchmarks/energy_validation.py 2mzs.pdb -r A -l B --repeats 5
+"""
+
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def write_unit(pdb_path, chains, unit_path):
+    """Writes the ATOM records of the first model for some chains."""
+    with open(pdb_path) as pdb_file, open(unit_path, "w") as unit_file:
+        for line in pdb_file:
+            if line.startswith("ENDMDL"):
+                break
+            if line.startswith("ATOM") and line[21] in chains:
+                # budeScan needs 80 character records
+                unit_file.write(f"{line.rstrip():<80}\n")
+        unit_file.write("END\n")
+    return
+
+
+def read_bals(bals_path):
+    """Returns the WT dGs and the columns of each residue of a .bals file."""
+    wild_type = []
+    residues = []
+    with open(bals_path) as bals_file:
+        for line in bals_file:
+            if line.startswith(("# WT InterDG:", "# WT IntraDG:")):
+                wild_type.append(float(line.split(":")[1]))
+            elif line.strip() and not line.startswith("#"):
+                residues.append(line.split())
+    return wild_type, residues
+
+
+def compare_bals(expected_path, actual_path):
+    """Returns the largest difference between two .bals files.
+
+    The files must have the same name and the index, residue and side chain
+    columns must be identical, otherwise the difference is infinite.
+    """
+    if not os.path.isfile(actual_path):
+        return float("inf")
+    expected_wt, expected_residues = read_bals(expected_path)
+    actual_wt, actual_residues = read_bals(actual_path)
+    if len(expected_residues) != len(actual_residues):
+        return float("inf")
+    differences = [abs(e - a) for e, a in zip(expected_wt, actual_wt)]
+    for expected, actual in zip(expected_residues, actual_residues):
+        if expected[:4] != actual[:4] or expected[10] != actual[10]:
+            return float("inf")
+        differences += [
+            abs(float(e) - float(a)) for e, a in zip(expected[4:10], actual[4:10])
+        ]
+    return max(differences)
+
+
+def run_budescan(bude_exe, ctrl_name, receptor, ligand, out_dir):
+    """Runs budeScan without rotamer correction."""
+    subprocess.run(
+        [
+            bude_exe,
+            "-f",
+            ctrl_name,
+            "-P",
+            receptor,
+            "-I",
+            ligand,
+            "-R",
+            out_dir,
+            "-a",
+            "00",
+        ],
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return
+
+
+def main():
+    """Scores each structure with both evaluators and prints a summary."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdbs", nargs="+", help="PDB files.")
+    parser.add_argument("-r", "--receptor", nargs="+", default=["A"])
+    parser.add_argument("-l", "--ligand", nargs="+", default=["B"])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--tolerance", type=float, default=2e-4)
+    args = parser.parse_args()
+
+    from budeAlaScan import config
+    from budeAlaScan.bude import energy
+    from budeAlaScan.myutils.layout import write_bude_libs
+
+    bude_exe = config.cfg.get(config.exe_sect, config.exe_bude_opt)
+    receptor_chains = "".join(args.receptor)
+    ligand_chains = "".join(args.ligand)
+    work_dir = tempfile.mkdtemp()
+    ctrl_name = os.path.join(
+        work_dir, config.cfg.get(config.names_sect, config.names_b_ctrl_opt)
+    )
+    write_bude_libs(work_dir, ctrl_name, work_dir)
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+
+    failed = False
+    print(
+        f"{'structure':>12} {'budeScan s':>11} {'numpy s':>9} {'speed up':>9} {'max diff':>9}"
+    )
+    for pdb in args.pdbs:
+        pdb_path = os.path.join(cwd, pdb)
+        name = os.path.splitext(os.path.basename(pdb))[0]
+        receptor = f"{name}_Ch{receptor_chains}.pdb"
+        ligand = f"{name}_Ch{ligand_chains}.pdb"
+        write_unit(pdb_path, receptor_chains, receptor)
+        write_unit(pdb_path, ligand_chains, ligand)
+
+        times = {"budeScan": [], "numpy": []}
+        for _ in range(args.repeats):
+            for evaluator, out_dir in (("budeScan", "bude"), ("numpy", "numpy")):
+                os.makedirs(out_dir, exist_ok=True)
+                start = time.perf_counter()
+                if evaluator == "budeScan":
+                    run_budescan(bude_exe, ctrl_name, receptor, ligand, out_dir)
+                else:
+                    energy.scan_pair(receptor, ligand, out_dir)
+                times[evaluator].append(time.perf_counter() - start)
+
+        max_difference = 0.0
+        for bals in os.listdir("bude"):
+            if bals.endswith(".bals"):
+                max_difference = max(
+                    max_difference,
+                    compare_bals(
+                        os.path.join("bude", bals), os.path.join("numpy", bals)
+                    ),
+                )
+        failed |= max_difference > args.tolerance
+        bude_time = min(times["budeScan"])
+        numpy_time = min(times["numpy"])
+        print(
+            f"{name:>12} {bude_time:11.3f} {numpy_time:9.3f} "
+            f"{bude_time / numpy_time:9.1f} {max_difference:9.5f}"
+        )
+        shutil.rmtree("bude")
+        shutil.rmtree("numpy")
+
+    os.chdir(cwd)
+    shutil.rmtree(work_dir)
+    if failed:
+        sys.exit(
+            f"The NumPy energies differ from budeScan by more than {args.tolerance}."
+        )
+    return
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Reports the import time of the budeAlaScan entry point.
+
+Notes
+-----
+Runs `budeAlaScan.py --version` under `python -X importtime`, which imports
+everything a scan job imports and then exits before doing any work. The
+total import time, the slowest top level imports and whether any plotting
+modules were loaded are reported, so that the cold start cost of a job can be
+tracked over time. Use `--json` to get machine readable output, e.g. to
+append to a log of results::
+
+    python benchmarks/import_time.py --repeats 5 --json >> import_times.jsonl
+"""
+
+import argparse
+import datetime
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+BUDE_ALA_SCAN = "/root/bin/budeAlaScan.py"
+# Modules that should never be imported when plots are turned off
+PLOTTING_MODULES = ("matplotlib", "qtconsole", "PyQt5")
+
+
+def main():
+    """Runs the entry point with import timing and prints a summary."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entry-point", default=BUDE_ALA_SCAN)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", action="store_true", help="Output JSON.")
+    args = parser.parse_args()
+
+    runs = [run_with_importtime(args.entry_point) for _ in range(args.repeats)]
+    # The slowest imports are taken from the last run, when the file system
+    # cache is warm, matching a worker that has run jobs before.
+    imports = runs[-1]["imports"]
+    top_level = sorted(
+        (imp for imp in imports if imp["level"] == 0),
+        key=lambda x: x["cumulative_us"],
+        reverse=True,
+    )[: args.top]
+    plotting = sorted(
+        {
+            imp["module"].split(".")[0]
+            for imp in imports
+            if imp["module"].split(".")[0] in PLOTTING_MODULES
+        }
+    )
+    summary = {
+        "date": datetime.datetime.now().isoformat(),
+        "entry_point": args.entry_point,
+        "wall_s": statistics.median(run["wall_s"] for run in runs),
+        "import_s": statistics.median(run["import_s"] for run in runs),
+        "modules": len(imports),
+        "plotting_modules": plotting,
+        "slowest": [
+            {"module": imp["module"], "cumulative_ms": imp["cumulative_us"] / 1000}
+            for imp in top_level
+        ],
+    }
+    if args.json:
+        print(json.dumps(summary))
+        return
+    print(f"Entry point:         {args.entry_point}")
+    print(f"Wall time (median):  {summary['wall_s']:.3f} s")
+    print(f"Import time:         {summary['import_s']:.3f} s")
+    print(f"Modules imported:    {summary['modules']}")
+    print(f"Plotting modules:    {', '.join(plotting) if plotting else 'none'}")
+    print(f"\nSlowest top level imports:")
+    for imp in summary["slowest"]:
+        print(f"{imp['cumulative_ms']:10.1f} ms  {imp['module']}")
+    return
+
+
+def run_with_importtime(entry_point):
+    """Runs the entry point and parses the `-X importtime` output."""
+    start = time.perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", entry_point, "--version"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    wall_time = time.perf_counter() - start
+    imports = parse_importtime(process.stderr)
+    import_time = sum(imp["cumulative_us"] for imp in imports if imp["level"] == 0)
+    return {"wall_s": wall_time, "import_s": import_time / 1e6, "imports": imports}
+
+
+def parse_importtime(stderr):
+    """Parses the lines written by `-X importtime`.
+
+    Notes
+    -----
+    Each line has the format
+    `import time: self [us] | cumulative | imported package`, where the
+    nesting level of the import is given by the indentation of the name.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3:
+            continue
+        name = fields[2].rstrip()
+        module = name.lstrip()
+        imports.append(
+            {
+                "module": module,
+                "self_us": int(fields[0]),
+                "cumulative_us": int(fields[1]),
+                "level": (len(name) - len(module) - 1) // 2,
+            }
+        )
+    return imports
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Measures the per job start up cost of running budeAlaScan.
+
+Notes
+-----
+Compares the two ways the job manager can start a scan:
+
+* `subprocess`: a new interpreter runs `budeAlaScan.py`, importing
+  ISAMBARD, NumPy, matplotlib and the BUDE libraries for every job.
+* `fork`: the worker has already imported `budeAlaScan.api` and forks a
+  child that calls `run_scan` directly.
+
+By default only the start up is timed, i.e. the time until the scan code
+could start running. With `--pdb` a full scan of that structure is run
+each way, so the saving can be compared with the total job time. This must
+be run inside the ala-scan container, or anywhere `budeAlaScan` is
+installed, for example::
+
+    python benchmarks/startup_benchmark.py --repeats 10
+    python benchmarks/startup_benchmark.py --pdb 1ycr.pdb -r A -l B
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BUDE_ALA_SCAN = "/root/bin/budeAlaScan.py"
+
+
+def main():
+    """Times each start up method and prints a summary."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--pdb", default=None, help="Run full scans of this PDB.")
+    parser.add_argument("-r", "--receptor", nargs="+", default=["A"])
+    parser.add_argument("-l", "--ligand", nargs="+", default=["B"])
+    args = parser.parse_args()
+
+    import_start = time.perf_counter()
+    from budeAlaScan import api
+
+    import_time = time.perf_counter() - import_start
+    print(f"One off import of budeAlaScan.api in the worker: {import_time:.3f} s")
+
+    if args.pdb is None:
+        methods = {
+            "subprocess": lambda: time_subprocess_startup(),
+            "fork": lambda: time_fork(lambda: None),
+        }
+    else:
+        pdb_path = os.path.abspath(args.pdb)
+        methods = {
+            "subprocess": lambda: time_subprocess_scan(
+                pdb_path, args.receptor, args.ligand
+            ),
+            "fork": lambda: time_fork(
+                lambda: api.run_scan(pdb_path, args.receptor, args.ligand, mode="scan")
+            ),
+        }
+    timings = {
+        name: [method() for _ in range(args.repeats)]
+        for (name, method) in methods.items()
+    }
+    print(f"{'method':12} {'mean s':>10} {'min s':>10} {'max s':>10}")
+    for name, times in timings.items():
+        print(
+            f"{name:12} {statistics.mean(times):10.3f} "
+            f"{min(times):10.3f} {max(times):10.3f}"
+        )
+    saving = statistics.mean(timings["subprocess"]) - statistics.mean(timings["fork"])
+    print(f"Time saved per job: {saving:.3f} s")
+    return
+
+
+def time_subprocess_startup():
+    """Times a new interpreter importing everything `budeAlaScan.py` does."""
+    start = time.perf_counter()
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import budeAlaScan.api; import budeAlaScan.plots.plot_results",
+        ],
+        check=True,
+    )
+    return time.perf_counter() - start
+
+
+def time_subprocess_scan(pdb_path, receptor, ligand):
+    """Times a full scan run through the command line program."""
+    work_dir = tempfile.mkdtemp()
+    cmd = (
+        [BUDE_ALA_SCAN, "scan", "-p", pdb_path, "-r"]
+        + receptor
+        + ["-l"]
+        + ligand
+        + ["-t"]
+    )
+    start = time.perf_counter()
+    subprocess.run(cmd, cwd=work_dir, stdout=subprocess.DEVNULL, check=True)
+    elapsed = time.perf_counter() - start
+    shutil.rmtree(work_dir)
+    return elapsed
+
+
+def time_fork(target):
+    """Times forking a child that runs target in a temporary directory."""
+    work_dir = tempfile.mkdtemp()
+    sys.stdout.flush()
+    start = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        exit_code = 1
+        try:
+            os.chdir(work_dir)
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+            target()
+            exit_code = 0
+        finally:
+            os._exit(exit_code)
+    _, wait_status = os.waitpid(pid, 0)
+    elapsed = time.perf_counter() - start
+    shutil.rmtree(work_dir)
+    if os.WEXITSTATUS(wait_status) != 0:
+        raise RuntimeError("The forked scan failed.")
+    return elapsed
+
+
+if __name__ == "__main__":
+    main()
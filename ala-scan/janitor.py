@@ -0,0 +1,205 @@
+"""Keeps the result files volume within its size and age limits.
+
+Notes
+-----
+The result files volume is shared by every worker, if it fills up no job
+can write its log or archive. The janitor periodically removes job
+archives that are older than `ARCHIVE_MAX_AGE_DAYS`, then, if the
+archives still use more than `ARCHIVE_BUDGET_GB`, removes the least
+recently downloaded archives until they are within budget. Archives that have never
+been downloaded are ordered by the time they were created. The job is
+marked with `archiveEvicted`, so the front end can tell the user that the
+archive is no longer available. Job logs are not counted against the
+budget, but they are removed once they are older than
+`ARCHIVE_MAX_AGE_DAYS`, so they cannot fill the volume either.
+
+After every pass the usage of the volume is written to the `metrics`
+collection, where it is read by the web app's result files usage endpoint.
+"""
+
+import datetime
+import importlib
+import os
+import re
+import shutil
+import sys
+import time
+import traceback
+
+from bson.objectid import ObjectId
+
+import database  # type: ignore
+
+ARCHIVE_NAME_PATTERN = re.compile(r"^([0-9a-f]{24})\.(zip|tar\.zst)$")
+LOG_NAME_PATTERN = re.compile(r"^[0-9a-f]{24}\.log$")
+DAY_SECONDS = 24 * 60 * 60
+
+
+def settings_from_env():
+    """Reads the janitor's limits from the environment.
+
+    Returns
+    -------
+    budget_bytes : int
+        Maximum number of bytes used by the archives.
+    max_age_seconds : float
+        Archives that have not been created or downloaded for this long,
+        and logs that have not been written for this long, are removed.
+    interval_seconds : float
+        Time between passes.
+    """
+    budget_bytes = int(float(os.environ.get("ARCHIVE_BUDGET_GB", 20)) * 1024 ** 3)
+    max_age_seconds = float(os.environ.get("ARCHIVE_MAX_AGE_DAYS", 90)) * DAY_SECONDS
+    interval_seconds = float(os.environ.get("JANITOR_INTERVAL_SECONDS", 600))
+    return budget_bytes, max_age_seconds, interval_seconds
+
+
+def run_janitor(result_files_dir, budget_bytes, max_age_seconds, interval_seconds):
+    """Cleans up the result files directory every `interval_seconds`."""
+    # The module is reloaded to establish a new connection
+    # to the database for the process fork
+    importlib.reload(database)
+    while True:
+        try:
+            metrics = clean_result_files(
+                result_files_dir, budget_bytes, max_age_seconds
+            )
+            print(
+                f"Result files: {metrics['totalBytes'] / 1024 ** 2:.1f} MB used, "
+                f"{metrics['evictedCount']} archives evicted, "
+                f"{metrics['removedLogCount']} logs removed.",
+                file=sys.stderr,
+            )
+        except Exception:
+            traceback.print_exc()
+        time.sleep(interval_seconds)
+    return
+
+
+def clean_result_files(result_files_dir, budget_bytes, max_age_seconds):
+    """Removes archives and logs to meet the limits and records metrics.
+
+    Parameters
+    ----------
+    result_files_dir : pathlib.Path
+        Directory containing the job logs and archives.
+    budget_bytes : int
+        Maximum number of bytes used by the archives.
+    max_age_seconds : float
+        Maximum time since an archive was created or last downloaded, or
+        a log was last written.
+
+    Returns
+    -------
+    metrics : dict
+        Usage of the result files volume after the pass.
+    """
+    archives, logs, total_bytes = _scan_result_files(result_files_dir)
+    archive_bytes = sum(size for (_, size, _) in archives.values())
+    last_used = _get_last_used(archives)
+    # Least recently used first
+    by_last_used = sorted(archives, key=lambda path: last_used[path])
+    oldest_allowed = time.time() - max_age_seconds
+    evicted = []
+    for path in by_last_used:
+        if last_used[path] >= oldest_allowed and archive_bytes <= budget_bytes:
+            break
+        job_id, size, _ = archives[path]
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
+        archive_bytes -= size
+        evicted.append((job_id, size))
+    _mark_evicted([job_id for (job_id, _) in evicted])
+    log_bytes = sum(size for (size, _) in logs.values())
+    removed_logs = []
+    for path, (size, mtime) in logs.items():
+        if mtime >= oldest_allowed:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
+        log_bytes -= size
+        removed_logs.append(size)
+    disk_usage = shutil.disk_usage(str(result_files_dir))
+    metrics = {
+        "totalBytes": total_bytes,
+        "archiveCount": len(archives) - len(evicted),
+        "archiveBytes": archive_bytes,
+        "budgetBytes": budget_bytes,
+        "maxAgeDays": max_age_seconds / DAY_SECONDS,
+        "volumeFreeBytes": disk_usage.free,
+        "volumeTotalBytes": disk_usage.total,
+        "evictedCount": len(evicted),
+        "evictedBytes": sum(size for (_, size) in evicted),
+        "logCount": len(logs) - len(removed_logs),
+        "logBytes": log_bytes,
+        "removedLogCount": len(removed_logs),
+        "removedLogBytes": sum(removed_logs),
+        "lastRun": datetime.datetime.now(),
+    }
+    database.METRICS.update_one(
+        {"_id": database.RESULT_FILES_METRICS_ID}, {"$set": metrics}, upsert=True
+    )
+    return metrics
+
+
+def _scan_result_files(result_files_dir):
+    # Returns the archives as {path: (job_id, size, mtime)}, the logs as
+    # {path: (size, mtime)} and the total size of all files, including
+    # partial archives.
+    archives = {}
+    logs = {}
+    total_bytes = 0
+    for entry in os.scandir(str(result_files_dir)):
+        if not entry.is_file():
+            continue
+        stat = entry.stat()
+        total_bytes += stat.st_size
+        match = ARCHIVE_NAME_PATTERN.match(entry.name)
+        if match:
+            archives[entry.path] = (
+                ObjectId(match.group(1)),
+                stat.st_size,
+                stat.st_mtime,
+            )
+        elif LOG_NAME_PATTERN.match(entry.name):
+            logs[entry.path] = (stat.st_size, stat.st_mtime)
+    return archives, logs, total_bytes
+
+
+def _get_last_used(archives):
+    # The time an archive was last downloaded, or created if it never has been
+    last_used = {path: mtime for (path, (_, _, mtime)) in archives.items()}
+    paths_by_id = {job_id: path for (path, (job_id, _, _)) in archives.items()}
+    for collection in database.JOB_COLLECTIONS:
+        jobs = collection.find(
+            {"_id": {"$in": list(paths_by_id)}, "lastDownloaded": {"$exists": True}},
+            projection={"lastDownloaded": 1},
+        )
+        for job in jobs:
+            path = paths_by_id[job["_id"]]
+            last_used[path] = max(last_used[path], job["lastDownloaded"].timestamp())
+    return last_used
+
+
+def _mark_evicted(job_ids):
+    if not job_ids:
+        return
+    # Jobs that followed an evicted job were sent its archive
+    for collection in database.JOB_COLLECTIONS:
+        collection.update_many(
+            {"$or": [{"_id": {"$in": job_ids}}, {"leaderId": {"$in": job_ids}}]},
+            {
+                "$set": {
+                    "archiveReady": False,
+                    "archiveEvicted": True,
+                    "archiveEvictedAt": datetime.datetime.now(),
+                }
+            },
+        )
+    return
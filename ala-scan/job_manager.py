@@ -1,24 +1,69 @@
 """Contains code for managing and processing alanine scan job requests."""
 
 import contextlib
-import glob
+import datetime
+import heapq
 import importlib
 import json
 import multiprocessing as mp
 import os
 import pathlib
+import re
+import select
 import shutil
+import signal
 import subprocess
 import sys
 import time
 import tempfile
+import traceback
 
+from budeAlaScan import api as bals_api  # type: ignore
+from budeAlaScan.myutils import layout as bals_layout  # type: ignore
+from bson.objectid import ObjectId
+import pymongo
+
+import archives
 import database  # type: ignore
+import janitor
+import limits
 from database import JobStatus, ALANINE_SCAN_JOBS, AUTO_JOBS, MANUAL_JOBS, RESIDUES_JOBS
 
 
 # This is hard coded as it needs to be included in the nginx.conf file
 RESULT_FILES_DIR = pathlib.Path("/balas-result-files")
+# Amount of output from budeAlaScan that is kept in the job document, the
+# full output is in the job's log file
+STD_OUT_TAIL_BYTES = 16 * 1024
+# Format and contents of the archive of each job's output, see `archives`
+ARCHIVE_CODEC, ARCHIVE_LEVEL = archives.settings_from_env()
+ARCHIVE_MANIFEST = archives.load_manifest()
+# How often files are added to the archive while a scan is running
+ARCHIVE_POLL_SECONDS = 10
+# How often a running scan checks if its job has been cancelled
+CANCEL_POLL_SECONDS = 2
+# How often post-processing that was lost, and the partial archives left
+# behind, are looked for
+POST_SWEEP_SECONDS = 60
+# States of the post-processing of a job, kept in its `postProcessing` field
+POST_QUEUED = "QUEUED"
+POST_RUNNING = "RUNNING"
+# Name of the archive of a job while it is built, see `archives.ArchiveBuilder`
+PARTIAL_ARCHIVE_PATTERN = re.compile(r"^\.([0-9a-f]{24})\.(zip|tar\.zst)\.partial$")
+# Number of processes each scan may use, e.g. to repack models with Scwrl
+JOB_CORES = int(os.environ.get("JOB_CORES", 1))
+# Adaptive sampling of the models of multi-model structures, off unless set,
+# see `budeAlaScan.api.run_scan`
+ADAPTIVE_PARAMS = {}
+if os.environ.get("JOB_SEM_TOLERANCE"):
+    ADAPTIVE_PARAMS["sem_tolerance"] = float(os.environ["JOB_SEM_TOLERANCE"])
+if os.environ.get("JOB_MAX_MODELS"):
+    ADAPTIVE_PARAMS["max_models"] = int(os.environ["JOB_MAX_MODELS"])
+# Wall clock, CPU and memory limits of the scans of each job type, see `limits`
+JOB_LIMITS = {
+    mode: limits.limits_from_env(mode)
+    for mode in ("scan", "auto", "manual", "residues")
+}
 
 
 @contextlib.contextmanager
@@ -33,71 +78,115 @@ def cd(newdir, cleanup=lambda: True):
         cleanup()
 
 
-@contextlib.contextmanager
-def tempdir():
-    """Create a temporary directory context for running analysis."""
-    dirpath = tempfile.mkdtemp()
-
-    def cleanup():
-        shutil.rmtree(dirpath)
-
-    with cd(dirpath, cleanup):
-        yield dirpath
-
-
 def main():
     """Establish the manager and worker subprocesses."""
     scan_processes = int(os.environ["SCAN_PROCS"])
     auto_processes = int(os.environ["AUTO_PROCS"])
     manual_processes = int(os.environ["MANUAL_PROCS"])
     residues_processes = int(os.environ["RESIDUES_PROCS"])
+    post_processes = int(os.environ.get("POST_PROCS", 1))
+    database.create_indexes()
+    publish_job_workers(
+        {
+            "scan": scan_processes,
+            "auto": auto_processes,
+            "manual": manual_processes,
+            "residues": residues_processes,
+            "post": post_processes,
+        }
+    )
+    # The BUDE libraries are shared by all jobs, only per job files are
+    # written to each job's temporary directory.
+    print(f"Shared BUDE libraries: {bals_layout.materialise_shared_libs()}")
     with mp.Manager() as manager:
+        post_queue, post_assigned, post_workers = make_queue_components(
+            post_process_jobs, post_processes, manager
+        )
+        # The queue is empty, so any post-processing in the database was lost
+        check_for_lost_post_processing(post_assigned, post_queue, startup=True)
         scan_queue, scan_assigned, scan_workers = make_queue_components(
-            get_and_run_scan_job, scan_processes, manager
+            get_and_run_scan_job, scan_processes, manager, post_queue
         )
         auto_queue, auto_assigned, auto_workers = make_queue_components(
-            get_and_run_auto_job, auto_processes, manager
+            get_and_run_auto_job, auto_processes, manager, post_queue
         )
         manual_queue, manual_assigned, manual_workers = make_queue_components(
-            get_and_run_manual_job, manual_processes, manager
+            get_and_run_manual_job, manual_processes, manager, post_queue
         )
         residues_queue, residues_assigned, residues_workers = make_queue_components(
-            get_and_run_residues_job, residues_processes, manager
+            get_and_run_residues_job, residues_processes, manager, post_queue
         )
+        janitor_process = start_janitor()
+        all_assigned = [
+            scan_assigned,
+            auto_assigned,
+            manual_assigned,
+            residues_assigned,
+            post_assigned,
+        ]
+        last_post_sweep = 0.0
         while True:
             check_for_lost_jobs(scan_assigned, ALANINE_SCAN_JOBS)
             check_for_lost_jobs(auto_assigned, AUTO_JOBS)
             check_for_lost_jobs(manual_assigned, MANUAL_JOBS)
             check_for_lost_jobs(residues_assigned, RESIDUES_JOBS)
             check_for_dead_jobs(
-                get_and_run_scan_job, scan_assigned, scan_queue, scan_workers
+                get_and_run_scan_job,
+                scan_assigned,
+                scan_queue,
+                scan_workers,
+                post_queue,
             )
             check_for_dead_jobs(
-                get_and_run_auto_job, auto_assigned, auto_queue, auto_workers
+                get_and_run_auto_job,
+                auto_assigned,
+                auto_queue,
+                auto_workers,
+                post_queue,
             )
             check_for_dead_jobs(
-                get_and_run_manual_job, manual_assigned, manual_queue, manual_workers
+                get_and_run_manual_job,
+                manual_assigned,
+                manual_queue,
+                manual_workers,
+                post_queue,
             )
             check_for_dead_jobs(
                 get_and_run_residues_job,
                 residues_assigned,
                 residues_queue,
                 residues_workers,
+                post_queue,
             )
-            populate_queue(scan_queue, ALANINE_SCAN_JOBS)
-            populate_queue(auto_queue, AUTO_JOBS)
-            populate_queue(manual_queue, MANUAL_JOBS)
-            populate_queue(residues_queue, RESIDUES_JOBS)
+            check_for_dead_jobs(
+                post_process_jobs, post_assigned, post_queue, post_workers
+            )
+            if not janitor_process.is_alive():
+                janitor_process = start_janitor()
+            if time.monotonic() - last_post_sweep > POST_SWEEP_SECONDS:
+                check_for_lost_post_processing(post_assigned, post_queue)
+                remove_orphaned_partial_archives(all_assigned)
+                last_post_sweep = time.monotonic()
+            populate_queue(scan_queue, scan_assigned, ALANINE_SCAN_JOBS)
+            populate_queue(auto_queue, auto_assigned, AUTO_JOBS)
+            populate_queue(manual_queue, manual_assigned, MANUAL_JOBS)
+            populate_queue(residues_queue, residues_assigned, RESIDUES_JOBS)
             time.sleep(2)
     return
 
 
-def make_queue_components(target_fn, processes, manager):
-    """Create the various objects required to create the job queue."""
+def make_queue_components(target_fn, processes, manager, *extra_args):
+    """Create the various objects required to create the job queue.
+
+    Notes
+    -----
+    Any `extra_args` are passed to `target_fn` after the standard queue,
+    assigned jobs and process index arguments.
+    """
     queue = manager.Queue()
     assigned_jobs = manager.list([None] * processes)
     workers = [
-        mp.Process(target=target_fn, args=(queue, assigned_jobs, proc_i))
+        mp.Process(target=target_fn, args=(queue, assigned_jobs, proc_i, *extra_args))
         for proc_i in range(processes)
     ]
     for worker in workers:
@@ -105,36 +194,291 @@ def make_queue_components(target_fn, processes, manager):
     return queue, assigned_jobs, workers
 
 
+def publish_job_workers(job_workers):
+    """Record the number of workers for each job type in the metrics.
+
+    Notes
+    -----
+    The web app reads these to estimate the wait of a new job, so the
+    counts are only set here.
+    """
+    database.METRICS.update_one(
+        {"_id": database.JOB_WORKERS_METRICS_ID},
+        {"$set": {**job_workers, "lastUpdated": datetime.datetime.now()}},
+        upsert=True,
+    )
+    return
+
+
+def start_janitor():
+    """Start the process that keeps the result files within their limits."""
+    janitor_process = mp.Process(
+        target=janitor.run_janitor,
+        args=(RESULT_FILES_DIR, *janitor.settings_from_env()),
+    )
+    janitor_process.start()
+    return janitor_process
+
+
 def check_for_lost_jobs(assigned_jobs, collection):
-    """Check for jobs that are assigned and have failed."""
-    running_jobs = collection.find({"status": JobStatus.RUNNING.value})
+    """Check for jobs that are assigned and have failed.
+
+    Notes
+    -----
+    Jobs that follow another job are never assigned to a worker, so they
+    are skipped, they fail along with their leader.
+    """
+    running_jobs = collection.find(
+        {"status": JobStatus.RUNNING.value, "leaderId": {"$exists": False}}
+    )
     for job in running_jobs:
         if job["_id"] not in assigned_jobs:
             update_job_status(job["_id"], JobStatus.FAILED, collection)
     return
 
 
-def check_for_dead_jobs(target_fn, assigned_jobs, queue, workers):
+def check_for_dead_jobs(target_fn, assigned_jobs, queue, workers, *extra_args):
     """Check status of workers and restarts any that are dead."""
     for (i, proc) in enumerate(workers):
         if not proc.is_alive():
             proc.terminate()
             assigned_jobs[i] = None
-            workers[i] = mp.Process(target=target_fn, args=(queue, assigned_jobs, i))
+            workers[i] = mp.Process(
+                target=target_fn, args=(queue, assigned_jobs, i, *extra_args)
+            )
             workers[i].start()
     return
 
 
-def populate_queue(queue, collection):
-    """Add jobs from the database to the queue shared by workers."""
-    submitted_jobs = collection.find({"status": JobStatus.SUBMITTED.value})
-    for job in sorted(submitted_jobs, key=lambda x: x["timeSubmitted"]):
-        queue.put(job["_id"])
-        update_job_status(job["_id"], JobStatus.QUEUED, collection)
+def check_for_lost_post_processing(post_assigned, post_queue, startup=False):
+    """Queue the post-processing of jobs again if it was lost.
+
+    Notes
+    -----
+    The post-processing of a job is recorded in its `postProcessing` field,
+    with the job's directory and its state, until its archive is ready. The
+    post-processing is lost if its worker stopped while it was running, or
+    if the job manager stopped, so at start up every job waiting for
+    post-processing is queued again. Completed jobs from before the state
+    was recorded cannot be archived, their archives are marked as evicted,
+    so the front end stops waiting for them.
+
+    Parameters
+    ----------
+    post_assigned : list
+        IDs of the jobs the post-processing workers are processing.
+    post_queue : multiprocessing.Queue
+        Queue of finished jobs for the post-processing workers.
+    startup : bool
+        True if the post-processing queue has just been created.
+    """
+    lost_states = [POST_QUEUED, POST_RUNNING] if startup else [POST_RUNNING]
+    for collection in database.JOB_COLLECTIONS:
+        lost_jobs = collection.find(
+            {"postProcessing.state": {"$in": lost_states}}, {"postProcessing": 1}
+        )
+        for job in lost_jobs:
+            if job["_id"] in post_assigned:
+                continue
+            post_processing = job["postProcessing"]
+            # The job is skipped if its post-processing finished meanwhile
+            requeued = collection.update_one(
+                {"_id": job["_id"], "postProcessing.state": post_processing["state"]},
+                {"$set": {"postProcessing.state": POST_QUEUED}},
+            )
+            if requeued.matched_count:
+                print(f"Requeued post-processing of job {job['_id']}!", file=sys.stderr)
+                post_queue.put(
+                    (
+                        job["_id"],
+                        post_processing["directory"],
+                        collection.name,
+                        post_processing["completed"],
+                    )
+                )
+        if startup:
+            unarchived_ids = collection.distinct(
+                "_id",
+                {
+                    "status": JobStatus.COMPLETED.value,
+                    "archiveReady": False,
+                    "archiveEvicted": {"$ne": True},
+                    "postProcessing": {"$exists": False},
+                    "leaderId": {"$exists": False},
+                },
+            )
+            if unarchived_ids:
+                collection.update_many(
+                    {
+                        "$or": [
+                            {"_id": {"$in": unarchived_ids}},
+                            {"leaderId": {"$in": unarchived_ids}},
+                        ],
+                        "status": JobStatus.COMPLETED.value,
+                    },
+                    {"$set": {"archiveEvicted": True}},
+                )
+    return
+
+
+def remove_orphaned_partial_archives(all_assigned):
+    """Remove the partial archives of jobs that are no longer being archived.
+
+    Notes
+    -----
+    A partial archive is kept while its job is assigned to a worker or is
+    waiting for post-processing, otherwise the process building it stopped
+    and it will never be finished.
+
+    Parameters
+    ----------
+    all_assigned : [list]
+        The assigned jobs lists of every kind of worker.
+    """
+    for entry in os.scandir(str(RESULT_FILES_DIR)):
+        match = PARTIAL_ARCHIVE_PATTERN.match(entry.name)
+        if match is None:
+            continue
+        job_id = ObjectId(match.group(1))
+        if any(job_id in assigned_jobs for assigned_jobs in all_assigned):
+            continue
+        if any(
+            collection.count_documents(
+                {"_id": job_id, "postProcessing": {"$exists": True}}, limit=1
+            )
+            for collection in database.JOB_COLLECTIONS
+        ):
+            continue
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(entry.path)
+            print(f"Removed orphaned partial archive {entry.name}!", file=sys.stderr)
+    return
+
+
+def populate_queue(queue, assigned_jobs, collection):
+    """Add jobs from the database to the queue shared by workers.
+
+    Notes
+    -----
+    Only as many jobs as there are idle workers, minus those already
+    waiting on the queue, are taken from the database. The remaining
+    jobs stay `SUBMITTED` until a worker is free. Jobs that follow
+    an identical job, see `database.job_fingerprint`, are not queued,
+    they take the status and results of their leader.
+
+    Workers are shared fairly between submitters, see `fair_share`, so
+    a submitter with many jobs waiting does not hold up everyone else.
+    The submitters with jobs waiting are found first, then each
+    submitter's oldest jobs are fetched, at most as many as there are free
+    workers, using the `(status, submitter, timeSubmitted)` index, so the
+    size of the backlog does not affect the memory used by the manager
+    process. Jobs submitted without a submitter are fetched together.
+
+    Parameters
+    ----------
+    queue : multiprocessing.Queue
+        Job queue shared by the workers.
+    assigned_jobs : list
+        A list of jobs ids currently being processed by the
+        workers, `None` marks an idle worker.
+    collection : pymongo.collection.Collection
+        Collection the jobs are taken from.
+
+    """
+    free_slots = list(assigned_jobs).count(None) - queue.qsize()
+    if free_slots <= 0:
+        return
+    waiting_query = {
+        "status": JobStatus.SUBMITTED.value,
+        "leaderId": {"$exists": False},
+    }
+    # `distinct` leaves out jobs without a submitter, `None` finds them
+    submitters = set(collection.distinct("submitter", waiting_query)) | {None}
+    waiting = []
+    for submitter in submitters:
+        jobs = list(
+            collection.find(
+                {**waiting_query, "submitter": submitter}, {"timeSubmitted": 1}
+            )
+            .sort("timeSubmitted", pymongo.ASCENDING)
+            .limit(free_slots)
+        )
+        if jobs:
+            waiting.append({"_id": submitter, "jobs": jobs})
+    if not waiting:
+        return
+    in_flight = {
+        group["_id"]: group["count"]
+        for group in collection.aggregate(
+            [
+                {
+                    "$match": {
+                        "status": {
+                            "$in": [JobStatus.QUEUED.value, JobStatus.RUNNING.value]
+                        },
+                        "leaderId": {"$exists": False},
+                    }
+                },
+                {"$group": {"_id": "$submitter", "count": {"$sum": 1}}},
+            ]
+        )
+    }
+    job_ids = fair_share(waiting, in_flight, free_slots)
+    collection.update_many(
+        {
+            "$or": [{"_id": {"$in": job_ids}}, {"leaderId": {"$in": job_ids}}],
+            "status": JobStatus.SUBMITTED.value,
+        },
+        {"$set": {"status": JobStatus.QUEUED.value}},
+    )
+    for job_id in job_ids:
+        queue.put(job_id)
     return
 
 
-def get_and_run_scan_job(scan_job_queue, assigned_jobs, proc_i):
+def fair_share(waiting, in_flight, free_slots):
+    """Choose the jobs that are given the free workers.
+
+    Notes
+    -----
+    Each free worker goes to the submitter with the fewest jobs queued or
+    running, ties go to the submitter whose next job was submitted first.
+    With a single submitter this is first in, first out. Jobs submitted
+    without a submitter are treated as one submitter.
+
+    Parameters
+    ----------
+    waiting : [dict]
+        The `jobs`, `_id` and `timeSubmitted`, waiting for each
+        submitter, oldest first.
+    in_flight : dict
+        Number of jobs queued or running for each submitter.
+    free_slots : int
+        Number of jobs to choose.
+
+    Returns
+    -------
+    job_ids : list
+        IDs of the jobs to queue, in the order they should run.
+    """
+    heap = [
+        (in_flight.get(group["_id"], 0), group["jobs"][0]["timeSubmitted"], i, 0)
+        for i, group in enumerate(waiting)
+    ]
+    heapq.heapify(heap)
+    job_ids = []
+    while heap and len(job_ids) < free_slots:
+        count, _, i, position = heapq.heappop(heap)
+        jobs = waiting[i]["jobs"]
+        job_ids.append(jobs[position]["_id"])
+        if position + 1 < len(jobs):
+            heapq.heappush(
+                heap, (count + 1, jobs[position + 1]["timeSubmitted"], i, position + 1)
+            )
+    return job_ids
+
+
+def get_and_run_scan_job(scan_job_queue, assigned_jobs, proc_i, post_queue):
     """Collect and run alanine scan jobs from queue.
 
     Parameters
@@ -147,6 +491,8 @@ def get_and_run_scan_job(scan_job_queue, assigned_jobs, proc_i):
     proc_i : int
         The index of the processor in the worker list and the
         assigned_jobs list.
+    post_queue : multiprocessing.Queue
+        Queue of finished jobs for the post-processing workers.
 
     """
     # The module is reloaded to establish a new connection
@@ -156,65 +502,66 @@ def get_and_run_scan_job(scan_job_queue, assigned_jobs, proc_i):
         job_id = scan_job_queue.get()
         print(f"Got scan job {job_id}!", file=sys.stderr)
         scan_job = ALANINE_SCAN_JOBS.find_one(job_id)
+        if not is_wanted(job_id, ALANINE_SCAN_JOBS):
+            print(f"Skipped cancelled scan job {job_id}!", file=sys.stderr)
+            continue
         update_job_status(job_id, JobStatus.RUNNING, ALANINE_SCAN_JOBS)
         assigned_jobs[proc_i] = job_id
         print("Running scan job {}!".format(job_id), file=sys.stderr)
-        with tempdir() as dirpath:
-            results = run_bals_scan(
-                job_id,
-                scan_job["pdbFile"],
-                scan_job["receptor"],
-                scan_job["ligand"],
-                scan_job["rotamerFixActive"],
-                dirpath,
-            )
-            ALANINE_SCAN_JOBS.update_one({"_id": job_id}, {"$set": results})
+        dirpath = tempfile.mkdtemp()
+        stored = False
+        try:
+            with cd(dirpath):
+                results = run_bals_scan(
+                    job_id,
+                    scan_job["pdbFile"],
+                    scan_job["receptor"],
+                    scan_job["ligand"],
+                    scan_job["rotamerFixActive"],
+                    ALANINE_SCAN_JOBS,
+                )
+            store_results(job_id, results, dirpath, ALANINE_SCAN_JOBS, post_queue)
+            stored = True
+        finally:
+            if not stored:
+                abandon_job(job_id, dirpath, ALANINE_SCAN_JOBS, post_queue)
         print("Finished scan job {}!".format(job_id), file=sys.stderr)
         assigned_jobs[proc_i] = None
     return
 
 
 def run_bals_scan(
-    job_id, pdb_string, receptor_chains, ligand_chains, rotamerFixActive, dirpath
+    job_id, pdb_string, receptor_chains, ligand_chains, rotamerFixActive, collection
 ):
     """Run a BALS job in `scan` mode."""
     pdb_filename = f"{job_id}.pdb"
     with open(pdb_filename, "w") as outf:
         outf.write(pdb_string)
-    scan_cmd = (
-        ["/root/bin/budeAlaScan.py", "scan", "-p", pdb_filename, "-r"]
-        + receptor_chains
-        + ["-l"]
-        + ligand_chains
-        + ["-t"]
-        + ([] if rotamerFixActive else ["-i"])
-    )  # Suppresses the plots from being displayed.
-    print("SCAN CMD", scan_cmd)
-    scan_process = subprocess.run(
-        scan_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+    scan_params = dict(
+        mode="scan",
+        receptor=receptor_chains,
+        ligand=ligand_chains,
+        rotamer_correction=rotamerFixActive,
+        cores=JOB_CORES,
+        **ADAPTIVE_PARAMS,
+    )
+    print("SCAN PARAMS", scan_params)
+    scan_process, std_out, input_error, bals_results = run_and_log(
+        job_id, pdb_filename, scan_params, collection
     )
-    std_out = scan_process.stdout.decode()
+    processed_output = None
     try:
         scan_process.check_returncode()
-        rec_json_paths = glob.glob("replot/*Rec_scan*.json")
-        lig_json_paths = glob.glob("replot/*Lig_scan*.json")
-        assert len(rec_json_paths) == 1
-        assert len(lig_json_paths) == 1
-        _zip_up_output(job_id, dirpath)
-        with open(rec_json_paths[0], "r") as inf:
-            rec_results = json.load(inf)
-        with open(lig_json_paths[0], "r") as inf:
-            lig_results = json.load(inf)
+        rec_results = bals_results["receptor"]
+        lig_results = bals_results["ligand"]
         processed_output = parser_friendly_output(rec_results, lig_results)
     except subprocess.CalledProcessError:
+        pass
+    if input_error or processed_output is None:
         processed_output = {"status": JobStatus.FAILED.value}
-        processed_output["std_out"] = std_out
-    if std_out.startswith("ERROR"):
-        processed_output = {"status": JobStatus.FAILED.value}
-        processed_output["std_out"] = std_out
     else:
         processed_output["status"] = JobStatus.COMPLETED.value
-        processed_output["std_out"] = std_out
+    processed_output["std_out"] = std_out
     return processed_output
 
 
@@ -227,6 +574,7 @@ def parser_friendly_output(bals_rec_output, bals_lig_output):
     assert rec_dg == lig_dg
     pfo = {
         "dG": rec_dg,
+        "modelsUsed": bals_rec_output["models_used"],
         "receptorData": [
             data for (_, data) in sorted(rec_output.items(), key=lambda x: int(x[0]))
         ],
@@ -237,7 +585,7 @@ def parser_friendly_output(bals_rec_output, bals_lig_output):
     return pfo
 
 
-def get_and_run_auto_job(auto_job_queue, assigned_jobs, proc_i):
+def get_and_run_auto_job(auto_job_queue, assigned_jobs, proc_i, post_queue):
     """Collect and run auto constellation jobs from the queue.
 
     Parameters
@@ -250,6 +598,8 @@ def get_and_run_auto_job(auto_job_queue, assigned_jobs, proc_i):
     proc_i : int
         The index of the processor in the worker list and the
         assigned_jobs list.
+    post_queue : multiprocessing.Queue
+        Queue of finished jobs for the post-processing workers.
 
     """
     # The module is reloaded to establish a new connection
@@ -259,23 +609,33 @@ def get_and_run_auto_job(auto_job_queue, assigned_jobs, proc_i):
         job_id = auto_job_queue.get()
         print(f"Got auto job {job_id}!", file=sys.stderr)
         auto_job = AUTO_JOBS.find_one(job_id)
+        if not is_wanted(job_id, AUTO_JOBS):
+            print(f"Skipped cancelled auto job {job_id}!", file=sys.stderr)
+            continue
         update_job_status(job_id, JobStatus.RUNNING, AUTO_JOBS)
         assigned_jobs[proc_i] = job_id
         print("Running auto job {}!".format(job_id), file=sys.stderr)
-        with tempdir() as dirpath:
-            results = run_bals_auto(
-                job_id,
-                auto_job["scanName"],
-                auto_job["pdbFile"],
-                auto_job["receptor"],
-                auto_job["ligand"],
-                auto_job["ddGCutOff"],
-                auto_job["constellationSize"],
-                auto_job["cutOffDistance"],
-                auto_job["rotamerFixActive"],
-                dirpath,
-            )
-            AUTO_JOBS.update_one({"_id": job_id}, {"$set": results})
+        dirpath = tempfile.mkdtemp()
+        stored = False
+        try:
+            with cd(dirpath):
+                results = run_bals_auto(
+                    job_id,
+                    auto_job["scanName"],
+                    auto_job["pdbFile"],
+                    auto_job["receptor"],
+                    auto_job["ligand"],
+                    auto_job["ddGCutOff"],
+                    auto_job["constellationSize"],
+                    auto_job["cutOffDistance"],
+                    auto_job["rotamerFixActive"],
+                    AUTO_JOBS,
+                )
+            store_results(job_id, results, dirpath, AUTO_JOBS, post_queue)
+            stored = True
+        finally:
+            if not stored:
+                abandon_job(job_id, dirpath, AUTO_JOBS, post_queue)
         print("Finished auto job {}!".format(job_id), file=sys.stderr)
         assigned_jobs[proc_i] = None
     return
@@ -291,44 +651,32 @@ def run_bals_auto(
     constellation_size,
     distance_cutoff,
     rotamerFixActive,
-    dirpath,
+    collection,
 ):
     """Run a BALS job in `auto` mode."""
     pdb_filename = f"{job_id}.pdb"
     with open(pdb_filename, "w") as outf:
         outf.write(pdb_string)
-    scan_cmd = (
-        ["/root/bin/budeAlaScan.py", "auto", "-p", pdb_filename, "-r"]
-        + receptor_chains
-        + ["-l"]
-        + ligand_chains
-        + [
-            "-d",
-            str(ddg_cutoff),
-            "-z",
-            str(constellation_size),
-            "-u",
-            str(distance_cutoff),
-            "-t",
-        ]
-        + ([] if rotamerFixActive else ["-i"])
-    )  # Suppresses the plots from being displayed.
-    print("AUTO CMD", scan_cmd)
-    scan_process = subprocess.run(
-        scan_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+    scan_params = dict(
+        mode="auto",
+        receptor=receptor_chains,
+        ligand=ligand_chains,
+        rotamer_correction=rotamerFixActive,
+        cores=JOB_CORES,
+        **ADAPTIVE_PARAMS,
+        ddg_cutoff=ddg_cutoff,
+        constellation_size=constellation_size,
+        cut_off=distance_cutoff,
+    )
+    print("AUTO PARAMS", scan_params)
+    scan_process, std_out, input_error, bals_results = run_and_log(
+        job_id, pdb_filename, scan_params, collection
     )
-    std_out = scan_process.stdout.decode()
+    results = None
     try:
         scan_process.check_returncode()
-        rec_json_paths = glob.glob("replot/*Rec_auto*.json")
-        lig_json_paths = glob.glob("replot/*Lig_auto*.json")
-        assert len(rec_json_paths) == 1
-        assert len(lig_json_paths) == 1
-        _zip_up_output(job_id, dirpath)
-        with open(rec_json_paths[0], "r") as inf:
-            rec_results = json.load(inf)
-        with open(lig_json_paths[0], "r") as inf:
-            lig_results = json.load(inf)
+        rec_results = bals_results["receptor"]
+        lig_results = bals_results["ligand"]
         scan_results = parser_friendly_output(rec_results, lig_results)
         scan_results["name"] = scanName
         scan_results["pdbFile"] = pdb_string
@@ -340,18 +688,18 @@ def run_bals_auto(
             "hotConstellations": [(k, v[0]) for k, v in lig_results["mutants"].items()],
         }
     except subprocess.CalledProcessError:
-        results = {"status": JobStatus.FAILED.value, "std_out": std_out}
+        pass
     except AttributeError:
-        results = {"status": JobStatus.FAILED.value, "std_out": std_out}
-    if std_out.startswith("ERROR"):
-        results = {"status": JobStatus.FAILED.value, "std_out": std_out}
+        pass
+    if input_error or results is None:
+        results = {"status": JobStatus.FAILED.value}
     else:
         results["status"] = JobStatus.COMPLETED.value
-        results["std_out"] = scan_process.stdout.decode()
+    results["std_out"] = std_out
     return results
 
 
-def get_and_run_manual_job(manual_job_queue, assigned_jobs, proc_i):
+def get_and_run_manual_job(manual_job_queue, assigned_jobs, proc_i, post_queue):
     """Collect and run a manual constellation jobs from the queue.
 
     Parameters
@@ -364,6 +712,8 @@ def get_and_run_manual_job(manual_job_queue, assigned_jobs, proc_i):
     proc_i : int
         The index of the processor in the worker list and the
         assigned_jobs list.
+    post_queue : multiprocessing.Queue
+        Queue of finished jobs for the post-processing workers.
 
     """
     # The module is reloaded to establish a new connection
@@ -373,21 +723,31 @@ def get_and_run_manual_job(manual_job_queue, assigned_jobs, proc_i):
         job_id = manual_job_queue.get()
         print(f"Got manual job {job_id}!", file=sys.stderr)
         manual_job = MANUAL_JOBS.find_one(job_id)
+        if not is_wanted(job_id, MANUAL_JOBS):
+            print(f"Skipped cancelled manual job {job_id}!", file=sys.stderr)
+            continue
         update_job_status(job_id, JobStatus.RUNNING, MANUAL_JOBS)
         assigned_jobs[proc_i] = job_id
         print("Running manual job {}!".format(job_id), file=sys.stderr)
-        with tempdir() as dirpath:
-            results = run_bals_manual(
-                job_id,
-                manual_job["scanName"],
-                manual_job["pdbFile"],
-                manual_job["receptor"],
-                manual_job["ligand"],
-                manual_job["residues"],
-                manual_job["rotamerFixActive"],
-                dirpath,
-            )
-            MANUAL_JOBS.update_one({"_id": job_id}, {"$set": results})
+        dirpath = tempfile.mkdtemp()
+        stored = False
+        try:
+            with cd(dirpath):
+                results = run_bals_manual(
+                    job_id,
+                    manual_job["scanName"],
+                    manual_job["pdbFile"],
+                    manual_job["receptor"],
+                    manual_job["ligand"],
+                    manual_job["residues"],
+                    manual_job["rotamerFixActive"],
+                    MANUAL_JOBS,
+                )
+            store_results(job_id, results, dirpath, MANUAL_JOBS, post_queue)
+            stored = True
+        finally:
+            if not stored:
+                abandon_job(job_id, dirpath, MANUAL_JOBS, post_queue)
         print("Finished manual job {}!".format(job_id), file=sys.stderr)
         assigned_jobs[proc_i] = None
     return
@@ -401,36 +761,30 @@ def run_bals_manual(
     ligand_chains,
     residues,
     rotamerFixActive,
-    dirpath,
+    collection,
 ):
     """Run a BALS job in `manual` mode."""
     pdb_filename = f"{job_id}.pdb"
     with open(pdb_filename, "w") as outf:
         outf.write(pdb_string)
-    scan_cmd = (
-        ["/root/bin/budeAlaScan.py", "manual", "-p", pdb_filename, "-r"]
-        + receptor_chains
-        + ["-l"]
-        + ligand_chains
-        + ["-c", ",".join(residues), "-t"]
-        + ([] if rotamerFixActive else ["-i"])
-    )  # Suppresses the plots from being displayed.
-    print("MANUAL CMD", scan_cmd)
-    scan_process = subprocess.run(
-        scan_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+    scan_params = dict(
+        mode="manual",
+        receptor=receptor_chains,
+        ligand=ligand_chains,
+        rotamer_correction=rotamerFixActive,
+        cores=JOB_CORES,
+        **ADAPTIVE_PARAMS,
+        constellations=[",".join(residues)],
     )
-    std_out = scan_process.stdout.decode()
+    print("MANUAL PARAMS", scan_params)
+    scan_process, std_out, input_error, bals_results = run_and_log(
+        job_id, pdb_filename, scan_params, collection
+    )
+    results = None
     try:
         scan_process.check_returncode()
-        rec_json_paths = glob.glob("replot/*Rec_manual*.json")
-        lig_json_paths = glob.glob("replot/*Lig_manual*.json")
-        assert len(rec_json_paths) == 1
-        assert len(lig_json_paths) == 1
-        _zip_up_output(job_id, dirpath)
-        with open(rec_json_paths[0], "r") as inf:
-            rec_results = json.load(inf)
-        with open(lig_json_paths[0], "r") as inf:
-            lig_results = json.load(inf)
+        rec_results = bals_results["receptor"]
+        lig_results = bals_results["ligand"]
         scan_results = parser_friendly_output(rec_results, lig_results)
         scan_results["name"] = scanName
         scan_results["pdbFile"] = pdb_string
@@ -442,18 +796,18 @@ def run_bals_manual(
             "hotConstellations": [(k, v[0]) for k, v in lig_results["mutants"].items()],
         }
     except subprocess.CalledProcessError:
-        results = {"status": JobStatus.FAILED.value, "std_out": std_out}
+        pass
     except AttributeError:
-        results = {"status": JobStatus.FAILED.value, "std_out": std_out}
-    if std_out.startswith("ERROR"):
-        results = {"status": JobStatus.FAILED.value, "std_out": std_out}
+        pass
+    if input_error or results is None:
+        results = {"status": JobStatus.FAILED.value}
     else:
         results["status"] = JobStatus.COMPLETED.value
-        results["std_out"] = scan_process.stdout.decode()
+    results["std_out"] = std_out
     return results
 
 
-def get_and_run_residues_job(residues_job_queue, assigned_jobs, proc_i):
+def get_and_run_residues_job(residues_job_queue, assigned_jobs, proc_i, post_queue):
     """Collect and run residues constellation jobs from the queue.
 
     Parameters
@@ -466,6 +820,8 @@ def get_and_run_residues_job(residues_job_queue, assigned_jobs, proc_i):
     proc_i : int
         The index of the processor in the worker list and the
         assigned_jobs list.
+    post_queue : multiprocessing.Queue
+        Queue of finished jobs for the post-processing workers.
 
     """
     # The module is reloaded to establish a new connection
@@ -475,22 +831,32 @@ def get_and_run_residues_job(residues_job_queue, assigned_jobs, proc_i):
         job_id = residues_job_queue.get()
         print(f"Got residues job {job_id}!", file=sys.stderr)
         residues_job = RESIDUES_JOBS.find_one(job_id)
+        if not is_wanted(job_id, RESIDUES_JOBS):
+            print(f"Skipped cancelled residues job {job_id}!", file=sys.stderr)
+            continue
         update_job_status(job_id, JobStatus.RUNNING, RESIDUES_JOBS)
         assigned_jobs[proc_i] = job_id
         print("Running residues job {}!".format(job_id), file=sys.stderr)
-        with tempdir() as dirpath:
-            results = run_bals_residues(
-                job_id,
-                residues_job["scanName"],
-                residues_job["pdbFile"],
-                residues_job["receptor"],
-                residues_job["ligand"],
-                residues_job["constellationSize"],
-                residues_job["residues"],
-                residues_job["rotamerFixActive"],
-                dirpath,
-            )
-            RESIDUES_JOBS.update_one({"_id": job_id}, {"$set": results})
+        dirpath = tempfile.mkdtemp()
+        stored = False
+        try:
+            with cd(dirpath):
+                results = run_bals_residues(
+                    job_id,
+                    residues_job["scanName"],
+                    residues_job["pdbFile"],
+                    residues_job["receptor"],
+                    residues_job["ligand"],
+                    residues_job["constellationSize"],
+                    residues_job["residues"],
+                    residues_job["rotamerFixActive"],
+                    RESIDUES_JOBS,
+                )
+            store_results(job_id, results, dirpath, RESIDUES_JOBS, post_queue)
+            stored = True
+        finally:
+            if not stored:
+                abandon_job(job_id, dirpath, RESIDUES_JOBS, post_queue)
         print("Finished residues job {}!".format(job_id), file=sys.stderr)
         assigned_jobs[proc_i] = None
     return
@@ -505,38 +871,31 @@ def run_bals_residues(
     constellationSize,
     residues,
     rotamerFixActive,
-    dirpath,
+    collection,
 ):
     """Run a BALS job in `residues` mode."""
     pdb_filename = f"{job_id}.pdb"
     with open(pdb_filename, "w") as outf:
         outf.write(pdb_string)
-    scan_cmd = (
-        ["/root/bin/budeAlaScan.py", "residues", "-p", pdb_filename, "-r"]
-        + receptor_chains
-        + ["-l"]
-        + ligand_chains
-        + ["-e"]
-        + residues
-        + ["-z", str(constellationSize), "-t"]
-        + ([] if rotamerFixActive else ["-i"])
-    )  # Suppresses the plots from being displayed.
-    print("RESIDUES", scan_cmd)
-    scan_process = subprocess.run(
-        scan_cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+    scan_params = dict(
+        mode="residues",
+        receptor=receptor_chains,
+        ligand=ligand_chains,
+        rotamer_correction=rotamerFixActive,
+        cores=JOB_CORES,
+        **ADAPTIVE_PARAMS,
+        residues=residues,
+        constellation_size=constellationSize,
     )
-    std_out = scan_process.stdout.decode()
+    print("RESIDUES PARAMS", scan_params)
+    scan_process, std_out, input_error, bals_results = run_and_log(
+        job_id, pdb_filename, scan_params, collection
+    )
+    results = None
     try:
         scan_process.check_returncode()
-        rec_json_paths = glob.glob("replot/*Rec_residues*.json")
-        lig_json_paths = glob.glob("replot/*Lig_residues*.json")
-        assert len(rec_json_paths) == 1
-        assert len(lig_json_paths) == 1
-        _zip_up_output(job_id, dirpath)
-        with open(rec_json_paths[0], "r") as inf:
-            rec_results = json.load(inf)
-        with open(lig_json_paths[0], "r") as inf:
-            lig_results = json.load(inf)
+        rec_results = bals_results["receptor"]
+        lig_results = bals_results["ligand"]
         scan_results = parser_friendly_output(rec_results, lig_results)
         scan_results["name"] = scanName
         scan_results["pdbFile"] = pdb_string
@@ -548,28 +907,352 @@ def run_bals_residues(
             "hotConstellations": [(k, v[0]) for k, v in lig_results["mutants"].items()],
         }
     except subprocess.CalledProcessError:
-        results = {"status": JobStatus.FAILED.value, "std_out": std_out}
+        pass
     except AttributeError:
-        results = {"status": JobStatus.FAILED.value, "std_out": std_out}
-    if std_out.startswith("ERROR"):
-        results = {"status": JobStatus.FAILED.value, "std_out": std_out}
+        pass
+    if input_error or results is None:
+        results = {"status": JobStatus.FAILED.value}
     else:
         results["status"] = JobStatus.COMPLETED.value
-        results["std_out"] = scan_process.stdout.decode()
+    results["std_out"] = std_out
     return results
 
 
-def update_job_status(scan_job_id, status, collection):
-    """Update status in database entry for alanine scan job."""
-    collection.update_one({"_id": scan_job_id}, {"$set": {"status": status.value}})
+def run_and_log(job_id, pdb_filename, scan_params, collection):
+    """Run a scan in a child process, writing its output to the job's log file.
+
+    Notes
+    -----
+    The worker has already imported `budeAlaScan`, so rather than starting
+    a new interpreter for every job, the worker forks and the child calls
+    `budeAlaScan.api.run_scan` directly. The child process keeps the global
+    state of `budeAlaScan` and any crash in the scan away from the worker.
+    The combined stdout and stderr of the child is written straight to
+    `RESULT_FILES_DIR/{job_id}.log`, only the end of the log is read back to
+    be stored in the job document. The results are sent back to the worker
+    as JSON through a pipe. While it waits, the worker adds the files that
+    the scan has finished writing to the job's archive and checks that the
+    job has not been cancelled or exceeded the limits of its job type. The
+    child leads a new process group, so stopping the job kills the scan
+    along with any BUDE or Scwrl processes it started. The peak memory,
+    CPU time and wall clock time of the scan are stored in the job
+    document, along with a `failureReason` if it exceeded a limit.
+
+    Parameters
+    ----------
+    job_id : bson.objectid.ObjectId
+        ID of the job being run.
+    pdb_filename : str
+        Name of the PDB file in the current directory.
+    scan_params : dict
+        Keyword arguments for `budeAlaScan.api.run_scan`.
+    collection : pymongo.collection.Collection
+        Collection the job is in.
+
+    Returns
+    -------
+    process : subprocess.CompletedProcess
+        The return code of the scan, non zero if it failed, was
+        cancelled or exceeded a limit of its job type.
+    std_out : str
+        The last `STD_OUT_TAIL_BYTES` of the output.
+    input_error : bool
+        True if budeAlaScan rejected the input, which is reported by
+        the output starting with "ERROR".
+    results : dict or None
+        The ligand and receptor results returned by `run_scan`.
+    """
+    log_path = RESULT_FILES_DIR / f"{job_id}.log"
+    job_limits = JOB_LIMITS[scan_params["mode"]]
+    log_fd = os.open(log_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    read_fd, write_fd = os.pipe()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        # The child must never return to the worker loop.
+        exit_code = 1
+        try:
+            os.setpgid(0, 0)
+            limits.set_cpu_rlimit(job_limits)
+            os.close(read_fd)
+            exit_code = _run_scan_child(log_fd, write_fd, pdb_filename, scan_params)
+        finally:
+            os._exit(exit_code)
+    with contextlib.suppress(OSError):
+        # Also set here, so the group exists before the job can be cancelled
+        os.setpgid(pid, pid)
+    monitor = limits.UsageMonitor(pid, job_limits)
+    os.close(log_fd)
+    os.close(write_fd)
+    # The worker is idle while the scan runs, so files that are finished
+    # are added to the job's archive while waiting for the results.
+    archive = make_archive_builder(job_id, os.getcwd())
+    chunks = []
+    last_archived = time.monotonic()
+    while True:
+        if not select.select([read_fd], [], [], CANCEL_POLL_SECONDS)[0]:
+            if not is_wanted(job_id, collection):
+                print(f"Cancelling job {job_id}!", file=sys.stderr)
+                with contextlib.suppress(ProcessLookupError):
+                    os.killpg(pid, signal.SIGKILL)
+            elif monitor.poll() is not None:
+                print(f"Job {job_id} {monitor.message()}", file=sys.stderr)
+                with contextlib.suppress(ProcessLookupError):
+                    os.killpg(pid, signal.SIGKILL)
+            elif time.monotonic() - last_archived >= ARCHIVE_POLL_SECONDS:
+                _add_to_archive(archive)
+                last_archived = time.monotonic()
+            continue
+        chunk = os.read(read_fd, 64 * 1024)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    os.close(read_fd)
+    payload = b"".join(chunks)
+    archive.close()
+    _, wait_status, rusage = os.wait4(pid, 0)
+    monitor.finish(wait_status, rusage)
+    if monitor.exceeded is not None:
+        with open(log_path, "a") as log_file:
+            log_file.write(f"\n{monitor.message()}\n")
+    collection.update_one({"_id": job_id}, {"$set": monitor.usage()})
+    if os.WIFSIGNALED(wait_status):
+        returncode = -os.WTERMSIG(wait_status)
+    else:
+        returncode = os.WEXITSTATUS(wait_status)
+    if returncode == 0 and (monitor.exceeded is not None or not payload):
+        # The scan finished as it was stopped, or sent no results, so it
+        # is treated as killed and its output is not used
+        returncode = -signal.SIGKILL
+    results = json.loads(payload.decode()) if returncode == 0 else None
+    process = subprocess.CompletedProcess(
+        args=["budeAlaScan.api.run_scan", pdb_filename], returncode=returncode
+    )
+    with open(log_path, "rb") as log_file:
+        input_error = log_file.read(len(b"ERROR")) == b"ERROR"
+        log_size = log_file.seek(0, os.SEEK_END)
+        log_file.seek(max(0, log_size - STD_OUT_TAIL_BYTES))
+        tail = log_file.read().decode(errors="replace")
+    if log_size > STD_OUT_TAIL_BYTES:
+        # Drop the partial first line and point to the full log
+        tail = tail.partition("\n")[2]
+        tail = (
+            f"[Output truncated to the last {STD_OUT_TAIL_BYTES} bytes, "
+            f"download the log for the full output.]\n{tail}"
+        )
+    return process, tail, input_error, results
+
+
+def _add_to_archive(archive):
+    # Archiving is an optimisation, a failure is left to the
+    # post-processing workers to report.
+    try:
+        archive.add_new_files(streamed_only=True)
+    except Exception:
+        traceback.print_exc()
+    return
+
+
+def _run_scan_child(log_fd, result_fd, pdb_filename, scan_params):
+    os.dup2(log_fd, sys.stdout.fileno())
+    os.dup2(log_fd, sys.stderr.fileno())
+    os.close(log_fd)
+    try:
+        results = bals_api.run_scan(pdb_filename, **scan_params)
+        exit_code = 0
+    except bals_api.ScanError as error:
+        print(error, file=sys.stderr)
+        results = None
+        exit_code = error.exit_code
+    except Exception:
+        traceback.print_exc()
+        results = None
+        exit_code = 1
+    sys.stdout.flush()
+    sys.stderr.flush()
+    with os.fdopen(result_fd, "wb") as result_pipe:
+        if results is not None:
+            result_pipe.write(json.dumps(results).encode())
+    return exit_code
+
+
+def store_results(job_id, results, dirpath, collection, post_queue):
+    """Store the results of a job and hand its directory to post-processing.
+
+    Notes
+    -----
+    The job's status is set when the results are stored, so a completed job
+    can be viewed straight away. The output archive is created later by the
+    post-processing workers, `archiveReady` is set to `True` once it can be
+    downloaded. The results are also stored in the unfinished jobs that
+    follow this job.
+
+    Parameters
+    ----------
+    job_id : bson.objectid.ObjectId
+        ID of the job.
+    results : dict
+        Results, including the status, of the job.
+    dirpath : str
+        Temporary directory the job was run in.
+    collection : pymongo.collection.Collection
+        Collection the job is in.
+    post_queue : multiprocessing.Queue
+        Queue of finished jobs for the post-processing workers.
+    """
+    completed = results["status"] == JobStatus.COMPLETED.value
+    if completed:
+        results["archiveReady"] = False
+    collection.update_many(database.job_and_followers(job_id), {"$set": results})
+    queue_post_processing(job_id, dirpath, collection, completed, post_queue)
+    return
+
+
+def abandon_job(job_id, dirpath, collection, post_queue):
+    """Hand the directory of a job that raised an error to post-processing.
+
+    Notes
+    -----
+    The error is left to stop the worker, which is restarted, and the job
+    is then marked as failed by `check_for_lost_jobs`. The directory is
+    removed and the partial archive discarded by the post-processing
+    workers.
+    """
+    queue_post_processing(job_id, dirpath, collection, False, post_queue)
+    return
+
+
+def queue_post_processing(job_id, dirpath, collection, completed, post_queue):
+    """Record the post-processing of a job and add it to the queue.
+
+    Notes
+    -----
+    The post-processing is recorded in the job's `postProcessing` field, even
+    if the job was cancelled and run for its followers, so that it can be
+    queued again if it is lost, see `check_for_lost_post_processing`.
+    """
+    collection.update_one(
+        {"_id": job_id},
+        {
+            "$set": {
+                "postProcessing": {
+                    "directory": dirpath,
+                    "completed": completed,
+                    "state": POST_QUEUED,
+                }
+            }
+        },
+    )
+    post_queue.put((job_id, dirpath, collection.name, completed))
+    return
+
+
+def post_process_jobs(post_queue, assigned_jobs, proc_i):
+    """Archive the output of finished jobs and remove their directories.
+
+    Notes
+    -----
+    The job's `postProcessing` state is set to running while it is
+    processed and removed once it has finished. If the job's directory no
+    longer exists, for example after the machine restarted, its archive
+    cannot be built and is marked as evicted.
+
+    Parameters
+    ----------
+    post_queue : multiprocessing.Queue
+        Queue of `(job_id, dirpath, collection_name, completed)` tuples.
+    assigned_jobs : list
+        A list of jobs ids currently being processed by the
+        workers.
+    proc_i : int
+        The index of the processor in the worker list and the
+        assigned_jobs list.
+
+    """
+    # The module is reloaded to establish a new connection
+    # to the database for the process fork
+    importlib.reload(database)
+    collections = {
+        collection.name: collection for collection in database.JOB_COLLECTIONS
+    }
+    while True:
+        job_id, dirpath, collection_name, completed = post_queue.get()
+        assigned_jobs[proc_i] = job_id
+        collection = collections[collection_name]
+        job_and_completed_followers = {
+            "$or": [
+                {"_id": job_id},
+                {"leaderId": job_id, "status": JobStatus.COMPLETED.value},
+            ]
+        }
+        try:
+            collection.update_one(
+                {"_id": job_id, "postProcessing": {"$exists": True}},
+                {"$set": {"postProcessing.state": POST_RUNNING}},
+            )
+            archive = make_archive_builder(job_id, dirpath)
+            if completed and os.path.isdir(dirpath):
+                archive_file = archive.finish()
+                collection.update_many(
+                    job_and_completed_followers,
+                    {
+                        "$set": {"archiveReady": True, "archiveFile": archive_file},
+                        "$unset": {"postProcessing": ""},
+                    },
+                )
+            else:
+                archive.discard()
+                update = {"$unset": {"postProcessing": ""}}
+                if completed:
+                    update["$set"] = {"archiveEvicted": True}
+                collection.update_many(job_and_completed_followers, update)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            shutil.rmtree(dirpath, ignore_errors=True)
+        print(f"Post-processed job {job_id}!", file=sys.stderr)
+        assigned_jobs[proc_i] = None
     return
 
 
-def _zip_up_output(job_id, dir_name):
-    output_file_name = str(RESULT_FILES_DIR / f"{job_id}")
-    shutil.make_archive(output_file_name, "zip", dir_name)
+def is_wanted(job_id, collection):
+    """Check that a job, or an unfinished job that follows it, is not cancelled.
+
+    Notes
+    -----
+    A cancelled job is still run while other jobs follow it, see
+    `database.job_and_followers`.
+    """
+    return collection.count_documents(database.job_and_followers(job_id), limit=1) > 0
+
+
+def update_job_status(scan_job_id, status, collection):
+    """Update status in database entry for a job and its followers.
+
+    Notes
+    -----
+    The time a job starts running is recorded as `timeStarted`, for the
+    queue wait statistics of each submitter.
+    """
+    update = {"status": status.value}
+    if status == JobStatus.RUNNING:
+        update["timeStarted"] = datetime.datetime.now()
+    collection.update_many(database.job_and_followers(scan_job_id), {"$set": update})
     return
 
 
+def make_archive_builder(job_id, dirpath):
+    """Create the builder for the archive of a job's output."""
+    return archives.ArchiveBuilder(
+        dirpath,
+        RESULT_FILES_DIR,
+        job_id,
+        ARCHIVE_CODEC,
+        ARCHIVE_LEVEL,
+        ARCHIVE_MANIFEST,
+    )
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,176 @@
+"""Enforces the resource limits of the scans run by the job manager.
+
+Notes
+-----
+Each job type has its own limits, read from the environment, where
+`{MODE}` is `SCAN`, `AUTO`, `MANUAL` or `RESIDUES`:
+
+* `{MODE}_WALL_SECONDS`: wall clock time of the scan.
+* `{MODE}_CPU_SECONDS`: CPU time of the scan and the processes it starts.
+* `{MODE}_MAX_RSS_MB`: resident memory of the scan and its processes.
+
+A limit that is not set, or is empty, is not enforced. The scan leads its
+own process group, so its usage is the sum over the processes in the group,
+read from `/proc` each time the worker polls the scan. A limit can be
+overrun by up to one poll before the group is killed. The CPU limit is also
+set as the `RLIMIT_CPU` of the scan process itself, so the kernel stops it
+even if the worker is not polling.
+
+The peak memory, CPU time and wall clock time of every scan are recorded in
+its job document, see `UsageMonitor.usage`.
+"""
+
+import collections
+import os
+import resource
+import signal
+import time
+
+Limits = collections.namedtuple("Limits", ["wall_seconds", "cpu_seconds", "max_rss_mb"])
+# Stored as the `failureReason` of jobs that are stopped for exceeding a limit
+FAILURE_REASONS = {
+    "wall_seconds": "wallTimeLimit",
+    "cpu_seconds": "cpuTimeLimit",
+    "max_rss_mb": "memoryLimit",
+}
+LIMIT_DESCRIPTIONS = {
+    "wall_seconds": "wall clock time limit of {:g} s",
+    "cpu_seconds": "CPU time limit of {:g} s",
+    "max_rss_mb": "memory limit of {:g} MB",
+}
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+_PAGE_MB = os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def limits_from_env(mode):
+    """Reads the limits of a job type from the environment.
+
+    Parameters
+    ----------
+    mode : str
+        Scan mode of the job type, e.g. "scan" or "auto".
+
+    Returns
+    -------
+    limits : Limits
+        The limits, `None` for those that are not set.
+    """
+    values = []
+    for field in Limits._fields:
+        value = os.environ.get(f"{mode.upper()}_{field.upper()}")
+        values.append(float(value) if value else None)
+    return Limits(*values)
+
+
+def set_cpu_rlimit(limits):
+    """Sets the CPU limit of the calling process, the scan child."""
+    if limits.cpu_seconds is not None:
+        seconds = int(limits.cpu_seconds) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (seconds, seconds + 5))
+    return
+
+
+def group_usage(pgid):
+    """Measures the usage of the live processes in a process group.
+
+    Notes
+    -----
+    The CPU time of a process includes its children that have finished,
+    so processes that BUDE or Scwrl ran and reaped are counted.
+
+    Returns
+    -------
+    rss_mb : float
+        Total resident memory in MB.
+    cpu_seconds : float
+        Total CPU time in seconds.
+    """
+    rss_pages = 0
+    cpu_ticks = 0
+    for entry in os.scandir("/proc"):
+        if not entry.name.isdigit():
+            continue
+        try:
+            with open(os.path.join(entry.path, "stat")) as stat_file:
+                stat = stat_file.read()
+        except OSError:
+            continue
+        # The command name is in brackets and may contain spaces
+        fields = stat[stat.rindex(")") + 2 :].split()
+        if int(fields[2]) != pgid:
+            continue
+        cpu_ticks += sum(int(ticks) for ticks in fields[11:15])
+        rss_pages += int(fields[21])
+    return rss_pages * _PAGE_MB, cpu_ticks / _CLOCK_TICKS
+
+
+class UsageMonitor:
+    """Tracks the usage of a running scan against its limits.
+
+    Parameters
+    ----------
+    pgid : int
+        Process group of the scan.
+    limits : Limits
+        Limits of the job.
+    """
+
+    def __init__(self, pgid, limits):
+        self.pgid = pgid
+        self.limits = limits
+        self.start = time.monotonic()
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss_mb = 0.0
+        self.exceeded = None
+
+    def poll(self):
+        """Measures the scan and checks its limits.
+
+        Returns
+        -------
+        exceeded : str or None
+            The field of `Limits` that was exceeded, if any.
+        """
+        rss_mb, cpu_seconds = group_usage(self.pgid)
+        self.wall_seconds = time.monotonic() - self.start
+        self.cpu_seconds = max(self.cpu_seconds, cpu_seconds)
+        self.peak_rss_mb = max(self.peak_rss_mb, rss_mb)
+        measured = Limits(self.wall_seconds, self.cpu_seconds, rss_mb)
+        for field, limit in zip(Limits._fields, self.limits):
+            if limit is not None and getattr(measured, field) > limit:
+                self.exceeded = field
+                return field
+        return None
+
+    def finish(self, wait_status, rusage):
+        """Records the final usage of the scan from `os.wait4`."""
+        self.wall_seconds = time.monotonic() - self.start
+        self.cpu_seconds = max(self.cpu_seconds, rusage.ru_utime + rusage.ru_stime)
+        # ru_maxrss is in KB on Linux
+        self.peak_rss_mb = max(self.peak_rss_mb, rusage.ru_maxrss / 1024)
+        if (
+            self.exceeded is None
+            and os.WIFSIGNALED(wait_status)
+            and os.WTERMSIG(wait_status) == signal.SIGXCPU
+        ):
+            self.exceeded = "cpu_seconds"
+        return
+
+    def message(self):
+        """Describes the limit that was exceeded, for the job's log."""
+        description = LIMIT_DESCRIPTIONS[self.exceeded].format(
+            getattr(self.limits, self.exceeded)
+        )
+        return f"The job was stopped as it exceeded its {description}."
+
+    def usage(self):
+        """Creates the usage fields stored in the job document."""
+        usage = {
+            "peakRssMB": round(self.peak_rss_mb, 1),
+            "cpuSeconds": round(self.cpu_seconds, 1),
+            "wallSeconds": round(self.wall_seconds, 1),
+        }
+        if self.exceeded is not None:
+            usage["failureReason"] = FAILURE_REASONS[self.exceeded]
+        return usage
@@ -0,0 +1,32 @@
+"""Makes the job manager and budeAlaScan importable for the tests."""
+
+import os
+import pathlib
+import shutil
+import sys
+import tarfile
+import tempfile
+
+ALA_SCAN = pathlib.Path(__file__).parent.parent
+BUDE_ALA_SCAN_TARBALL = ALA_SCAN / "budeAlaScan-dist" / "budeAlaScan.tar.gz"
+
+# The image copies the web app's database module next to the job manager.
+sys.path.insert(0, str(ALA_SCAN))
+if not (ALA_SCAN / "database.py").exists():
+    sys.path.insert(1, str(ALA_SCAN.parent / "web" / "bals"))
+os.environ.setdefault("BALAS_DB_NAME", "localhost")
+
+# Importing budeAlaScan writes its ini file to the home directory.
+TESTS_HOME = tempfile.mkdtemp(prefix="balas-tests-")
+os.environ["HOME"] = TESTS_HOME
+
+try:
+    import budeAlaScan  # noqa: F401
+except ImportError:
+    with tarfile.open(str(BUDE_ALA_SCAN_TARBALL)) as tarball:
+        tarball.extractall(TESTS_HOME)
+    sys.path.insert(0, os.path.join(TESTS_HOME, "budeAlaScan"))
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(TESTS_HOME, ignore_errors=True)
@@ -0,0 +1,70 @@
+"""Tests the NumPy alanine scan of budeAlaScan against the output of budeScan."""
+
+import pathlib
+
+import pytest
+
+from budeAlaScan.bude import energy
+
+TESTS_DATA = pathlib.Path(__file__).parent.parent.parent / "web" / "tests_data"
+# .bals files written by budeScan 1.2.10 without rotamer correction
+BUDE_SCAN_DATA = TESTS_DATA / "bude_scan"
+# Largest difference in kJ/mol, budeScan computes the energies in single precision
+ENERGY_TOLERANCE = 2e-3
+
+
+def write_docking_unit(pdb_fname, chain, unit_fname):
+    """Writes the ATOM records of a chain of the first model, as budeAlaScan does."""
+    unit_lines = []
+    for a_line in pdb_fname.read_text().splitlines():
+        if a_line.startswith("ENDMDL"):
+            break
+        if a_line.startswith("ATOM") and a_line[21] == chain:
+            unit_lines.append(a_line)
+    unit_fname.write_text("\n".join(unit_lines + ["END", ""]))
+    return str(unit_fname)
+
+
+def read_bals(bals_fname):
+    """Returns the wild type energies and the rows of a .bals file."""
+    wild_type = {}
+    rows = []
+    for a_line in bals_fname.read_text().splitlines():
+        if a_line.startswith("# WT"):
+            name, value = a_line[2:].split(":")
+            wild_type[name.strip()] = float(value)
+        elif a_line.strip() and not a_line.startswith("#"):
+            rows.append(a_line.split())
+    return wild_type, rows
+
+
+def assert_same_bals(numpy_fname, bude_fname):
+    numpy_wild_type, numpy_rows = read_bals(numpy_fname)
+    bude_wild_type, bude_rows = read_bals(bude_fname)
+
+    assert numpy_wild_type == pytest.approx(bude_wild_type, abs=ENERGY_TOLERANCE)
+    assert len(numpy_rows) == len(bude_rows)
+    for numpy_row, bude_row in zip(numpy_rows, bude_rows):
+        # Index, number, name, chain and the number of side chain atoms
+        assert numpy_row[:4] == bude_row[:4]
+        assert numpy_row[10] == bude_row[10]
+        assert [float(value) for value in numpy_row[4:10]] == pytest.approx(
+            [float(value) for value in bude_row[4:10]], abs=ENERGY_TOLERANCE
+        )
+
+
+@pytest.mark.parametrize("pdb_code", ["1ycr", "1l8c"])
+def test_scan_pair_matches_bude_scan(pdb_code, tmp_path):
+    pdb_fname = TESTS_DATA / f"{pdb_code}.pdb"
+    receptor = write_docking_unit(pdb_fname, "A", tmp_path / f"{pdb_code}_ChA.pdb")
+    ligand = write_docking_unit(pdb_fname, "B", tmp_path / f"{pdb_code}_ChB.pdb")
+    out_dir = tmp_path / "results"
+    out_dir.mkdir()
+
+    energy.scan_pair(receptor, ligand, str(out_dir))
+
+    for bals_name in (
+        f"{pdb_code}_ChA_pdb_R01_S0001_C0000.bals",
+        f"{pdb_code}_ChB_pdb_L00001_S0001_C0000.bals",
+    ):
+        assert_same_bals(out_dir / bals_name, BUDE_SCAN_DATA / bals_name)
@@ -0,0 +1,67 @@
+"""Tests the sharing of free workers between submitters by the job manager."""
+
+import datetime
+
+import job_manager
+
+START = datetime.datetime(2026, 3, 2, 9, 0)
+
+
+def make_group(submitter, *minutes):
+    """Makes the waiting jobs of a submitter, submitted at START plus minutes."""
+    return {
+        "_id": submitter,
+        "jobs": [
+            {
+                "_id": f"{submitter}-{minute}",
+                "timeSubmitted": START + datetime.timedelta(minutes=minute),
+            }
+            for minute in minutes
+        ],
+    }
+
+
+def test_single_submitter_is_first_in_first_out():
+    waiting = [make_group("alice", 1, 2, 3, 4)]
+
+    assert job_manager.fair_share(waiting, {}, 3) == [
+        "alice-1",
+        "alice-2",
+        "alice-3",
+    ]
+
+
+def test_large_submitter_does_not_starve_others():
+    # Alice submitted a large batch before Bob and Carol submitted a job each
+    waiting = [
+        make_group("alice", *range(10)),
+        make_group("bob", 20),
+        make_group("carol", 30),
+    ]
+
+    job_ids = job_manager.fair_share(waiting, {}, 4)
+
+    assert job_ids == ["alice-0", "bob-20", "carol-30", "alice-1"]
+
+
+def test_jobs_in_flight_count_against_submitter():
+    waiting = [make_group("alice", 1, 2), make_group("bob", 5, 6)]
+
+    job_ids = job_manager.fair_share(waiting, {"alice": 2}, 3)
+
+    assert job_ids == ["bob-5", "bob-6", "alice-1"]
+
+
+def test_none_submitter_is_one_submitter():
+    # Jobs from before submitters were recorded share a single group
+    waiting = [make_group(None, 1, 2, 3), make_group("bob", 4)]
+
+    job_ids = job_manager.fair_share(waiting, {None: 1}, 3)
+
+    assert job_ids == ["bob-4", "None-1", "None-2"]
+
+
+def test_fewer_jobs_than_slots():
+    waiting = [make_group("alice", 1), make_group("bob", 2)]
+
+    assert job_manager.fair_share(waiting, {}, 5) == ["alice-1", "bob-2"]
@@ -0,0 +1,106 @@
+"""Tests matching the BUDE results to the interface residues in budeAlaScan."""
+
+import pathlib
+
+import pytest
+
+from budeAlaScan.config import deltaG_key
+from budeAlaScan.myutils.ensemble import update_ddg_stats
+from budeAlaScan.myutils.interface import (
+    check_residue_count,
+    pdb_residue_keys,
+    zero_non_interface,
+)
+
+TESTS_DATA = pathlib.Path(__file__).parent.parent.parent / "web" / "tests_data"
+
+
+def make_ligand_pdb(tmp_path):
+    """Writes the ligand of 1ycr with residue 20 renumbered 19A, and a water.
+
+    Returns the file name and the residue numbers of the ligand as BUDE
+    writes them in its results, without insertion codes.
+    """
+    ligand_lines = []
+    bals_numbers = []
+    previous_residue = None
+    for a_line in (TESTS_DATA / "1ycr.pdb").read_text().splitlines():
+        if not (a_line.startswith("ATOM") and a_line[21] == "B"):
+            continue
+        if a_line[22:26].strip() == "20":
+            a_line = a_line[:22] + "  19A" + a_line[27:]
+        if a_line[21:27] != previous_residue:
+            bals_numbers.append(a_line[22:26].strip())
+            previous_residue = a_line[21:27]
+        ligand_lines.append(a_line)
+    water = (
+        "HETATM 9999  O   HOH B 101      10.000  10.000  10.000  1.00 30.00           O"
+    )
+    pdb_fname = tmp_path / "1ycr_B.pdb"
+    pdb_fname.write_text("\n".join(ligand_lines + [water, "END", ""]))
+    return str(pdb_fname), bals_numbers
+
+
+def make_results(bals_numbers, ddg):
+    """Makes BUDE results keyed by the Index column, as parse_getsd_results does."""
+    results = {
+        str(index): (number, "ALA", "B", ddg, 0.0, 0.5)
+        for index, number in enumerate(bals_numbers, start=1)
+    }
+    results[deltaG_key] = -100.0
+    return results
+
+
+def test_pdb_residue_keys_insertion_code(tmp_path):
+    pdb_fname, bals_numbers = make_ligand_pdb(tmp_path)
+    residue_keys = pdb_residue_keys(pdb_fname)
+
+    # The water is not read, as BUDE reads only ATOM records.
+    assert len(residue_keys) == len(bals_numbers)
+    assert residue_keys[:4] == [("B", "17"), ("B", "18"), ("B", "19"), ("B", "19A")]
+
+
+def test_zero_non_interface_insertion_code(tmp_path):
+    pdb_fname, bals_numbers = make_ligand_pdb(tmp_path)
+    residue_keys = pdb_residue_keys(pdb_fname)
+    residues_ddg = [make_results(bals_numbers, 2.5)]
+
+    # Both residues are numbered 19 in the results, only 19A is at the interface.
+    zeroed = zero_non_interface(residues_ddg, {("B", "19A")}, residue_keys)
+
+    assert zeroed == len(residue_keys) - 1
+    assert residues_ddg[0]["4"][3] == 2.5
+    assert residues_ddg[0]["3"][3] == 0.0
+    assert residues_ddg[0]["3"][5] == 0.0
+    assert residues_ddg[0][deltaG_key] == -100.0
+
+
+def test_zero_non_interface_unknown_index(tmp_path):
+    pdb_fname, bals_numbers = make_ligand_pdb(tmp_path)
+    residue_keys = pdb_residue_keys(pdb_fname)
+    residues_ddg = [make_results(bals_numbers + ["99"], 2.5)]
+
+    with pytest.raises(ValueError):
+        zero_non_interface(residues_ddg, {("B", "19A")}, residue_keys)
+
+
+def test_check_residue_count(tmp_path):
+    pdb_fname, bals_numbers = make_ligand_pdb(tmp_path)
+    residue_keys = pdb_residue_keys(pdb_fname)
+
+    check_residue_count(residue_keys, len(bals_numbers), "the sequence file")
+    with pytest.raises(ValueError):
+        check_residue_count(residue_keys, len(bals_numbers) + 1, "the sequence file")
+
+
+def test_update_ddg_stats_insertion_code(tmp_path):
+    pdb_fname, bals_numbers = make_ligand_pdb(tmp_path)
+    residue_keys = pdb_residue_keys(pdb_fname)
+    models_ddg = make_results(bals_numbers, (1.0, 3.0))
+
+    ddg_stats = {}
+    update_ddg_stats(ddg_stats, models_ddg, residue_keys)
+
+    assert len(ddg_stats) == len(residue_keys)
+    assert ddg_stats[("B", "19")] == [2, 2.0, 2.0]
+    assert ddg_stats[("B", "19A")] == [2, 2.0, 2.0]
@@ -0,0 +1,40 @@
+"""Tests the size limit of the Scwrl repack cache of budeAlaScan."""
+
+import os
+
+from budeAlaScan.myutils import repack_cache
+
+
+def make_entries(cache_dir, count, entry_bytes):
+    """Makes cache entries, the first ones were used least recently."""
+    for i in range(count):
+        entry_fname = cache_dir / f"{i:02d}.json.gz"
+        entry_fname.write_bytes(b"x" * entry_bytes)
+        os.utime(str(entry_fname), (i, i))
+    return
+
+
+def test_prune_removes_least_recently_used(tmp_path):
+    make_entries(tmp_path, 10, 1000)
+    # Only entries are counted and removed
+    (tmp_path / "other.json.gz").mkdir()
+    (tmp_path / "entry.tmp").write_bytes(b"x" * 1000)
+
+    removed = repack_cache.prune(str(tmp_path), 5000)
+
+    assert removed == 6
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "06.json.gz",
+        "07.json.gz",
+        "08.json.gz",
+        "09.json.gz",
+        "entry.tmp",
+        "other.json.gz",
+    ]
+
+
+def test_prune_below_limit(tmp_path):
+    make_entries(tmp_path, 4, 1000)
+
+    assert repack_cache.prune(str(tmp_path), 5000) == 0
+    assert len(list(tmp_path.iterdir())) == 4
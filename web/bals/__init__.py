@@ -1,6 +1,6 @@
-from flask import Flask
+from quart import Quart
 
 
-app = Flask(__name__)
+app = Quart(__name__)
 
 import bals.views
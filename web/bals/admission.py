@@ -0,0 +1,121 @@
+"""Contains the admission control of job submissions.
+
+Notes
+-----
+Before a job is submitted, the queue of its job type is checked. Jobs are
+rejected with a 429 response, and a `Retry-After` header, if more than
+`ADMISSION_MAX_QUEUED` jobs would be waiting or the estimated wait is
+longer than `ADMISSION_MAX_WAIT_SECONDS`. Both are unlimited by default.
+
+The wait is estimated from the jobs that completed recently. When they
+have an `estimatedCost`, see `bals.preflight`, the backlog is the cost of
+the waiting jobs converted to seconds at the recent rate, otherwise it is
+the number of waiting jobs times the mean run time of recent jobs, or
+`ADMISSION_DEFAULT_JOB_SECONDS` if no job has completed yet. The backlog
+is shared by the workers of the job type, which the job manager records in
+the metrics collection when it starts, see
+`async_database.get_job_workers`.
+"""
+
+import datetime
+import math
+
+# Shortest `Retry-After` given to a rejected submission
+MIN_RETRY_SECONDS = 10
+
+
+class QueueFull(Exception):
+    """Raised when a job type is not accepting submissions.
+
+    Attributes
+    ----------
+    retry_after : int
+        Seconds to wait before submitting again.
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def queue_status(stats, default_job_seconds, workers):
+    """Estimates the wait for a job type from the state of its queue.
+
+    Parameters
+    ----------
+    stats : dict
+        Queue statistics from `async_database.get_queue_stats`.
+    default_job_seconds : float
+        Run time assumed for a job if none have completed recently.
+    workers : int
+        Number of workers that run jobs of this type.
+
+    Returns
+    -------
+    status : dict
+        The number of `waiting` and `running` jobs and of `workers`, the
+        estimated
+        `jobSeconds` of a job, the `estimatedWaitSeconds` before a new
+        job starts and the `estimatedStartTime`.
+    """
+    recent = stats["recent"]
+    if recent["count"]:
+        job_seconds = recent["wallSeconds"] / recent["count"]
+    else:
+        job_seconds = default_job_seconds
+    if recent["estimatedCost"] > 0 and stats["waitingCost"] > 0:
+        backlog_seconds = (
+            stats["waitingCost"] * recent["wallSeconds"] / recent["estimatedCost"]
+        )
+    else:
+        backlog_seconds = stats["waiting"] * job_seconds
+    wait_seconds = backlog_seconds / max(workers, 1)
+    start_time = datetime.datetime.now() + datetime.timedelta(seconds=wait_seconds)
+    return {
+        "waiting": stats["waiting"],
+        "running": stats["running"],
+        "workers": workers,
+        "jobSeconds": round(job_seconds, 1),
+        "estimatedWaitSeconds": round(wait_seconds, 1),
+        "estimatedStartTime": str(start_time.replace(microsecond=0)),
+    }
+
+
+def check_admission(status, job_count, max_queued, max_wait_seconds):
+    """Checks that a job type can accept more jobs.
+
+    Parameters
+    ----------
+    status : dict
+        Status of the queue from `queue_status`.
+    job_count : int
+        Number of jobs being submitted.
+    max_queued : float
+        Largest number of jobs allowed to wait.
+    max_wait_seconds : float
+        Longest estimated wait accepted.
+
+    Raises
+    ------
+    QueueFull
+        If the jobs should not be accepted.
+    """
+    workers = max(status["workers"], 1)
+    excess_jobs = status["waiting"] + job_count - max_queued
+    if excess_jobs > 0:
+        raise QueueFull(
+            f"The queue is full, {status['waiting']} jobs are waiting.",
+            retry_after(excess_jobs * status["jobSeconds"] / workers),
+        )
+    if status["estimatedWaitSeconds"] > max_wait_seconds:
+        raise QueueFull(
+            "The queue is full, the estimated wait is "
+            f"{status['estimatedWaitSeconds'] / 60:.0f} minutes.",
+            retry_after(status["estimatedWaitSeconds"] - max_wait_seconds),
+        )
+    return
+
+
+def retry_after(seconds):
+    """Rounds the time until the queue has space to a `Retry-After` value."""
+    return max(MIN_RETRY_SECONDS, math.ceil(seconds))
@@ -0,0 +1,590 @@
+"""Contains code for asynchronous access to the database backend of BALS.
+
+Notes
+-----
+This module is used by the web app, which is served by an ASGI server. The
+job manager uses the blocking interface in `database`, which also defines the
+collections, the `JobStatus` enum and the export helpers that are shared by
+both modules.
+"""
+
+import datetime
+
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
+import motor.motor_asyncio
+
+from bals.database import (
+    ALANINE_SCAN_JOBS as _ALANINE_SCAN_JOBS,
+    AUTO_JOBS as _AUTO_JOBS,
+    BATCHES as _BATCHES,
+    METRICS as _METRICS,
+    MANUAL_JOBS as _MANUAL_JOBS,
+    RESIDUES_JOBS as _RESIDUES_JOBS,
+    ACTIVE_STATUSES,
+    JOB_DETAILS_PROJECTION,
+    JOB_WORKERS_METRICS_ID,
+    RESULT_FILES_METRICS_ID,
+    JobStatus,
+    db_name,
+    job_fingerprint,
+)
+
+CLIENT = None
+ALANINE_SCAN_JOBS = None
+AUTO_JOBS = None
+MANUAL_JOBS = None
+RESIDUES_JOBS = None
+BATCHES = None
+METRICS = None
+
+
+def connect(max_pool_size, min_pool_size):
+    """Create the client and collections used by the web app.
+
+    Notes
+    -----
+    The Motor client is bound to the event loop that is running when it is
+    first used, so this must be called from inside the serving loop, i.e.
+    from a `before_serving` function, rather than at import time.
+
+    Parameters
+    ----------
+    max_pool_size : int
+        Maximum number of connections to the database held by this
+        worker process.
+    min_pool_size : int
+        Number of connections kept open while the worker is idle.
+    """
+    global CLIENT, ALANINE_SCAN_JOBS, AUTO_JOBS, MANUAL_JOBS, RESIDUES_JOBS
+    global BATCHES, METRICS
+    CLIENT = motor.motor_asyncio.AsyncIOMotorClient(
+        db_name, 27017, maxPoolSize=max_pool_size, minPoolSize=min_pool_size
+    )
+    bals_db = CLIENT[_ALANINE_SCAN_JOBS.database.name]
+    ALANINE_SCAN_JOBS = bals_db[_ALANINE_SCAN_JOBS.name]
+    AUTO_JOBS = bals_db[_AUTO_JOBS.name]
+    MANUAL_JOBS = bals_db[_MANUAL_JOBS.name]
+    RESIDUES_JOBS = bals_db[_RESIDUES_JOBS.name]
+    BATCHES = bals_db[_BATCHES.name]
+    METRICS = bals_db[_METRICS.name]
+    return
+
+
+def get_job_collection(job_type):
+    """Get the collection that holds jobs of the given type.
+
+    Parameters
+    ----------
+    job_type : str
+        One of "scan", "auto", "manual" or "residues".
+    """
+    return {
+        "scan": ALANINE_SCAN_JOBS,
+        "auto": AUTO_JOBS,
+        "manual": MANUAL_JOBS,
+        "residues": RESIDUES_JOBS,
+    }[job_type]
+
+
+def close():
+    """Close all connections held by the client."""
+    if CLIENT is not None:
+        CLIENT.close()
+    return
+
+
+async def _submit_job(job_type, submission):
+    collection = get_job_collection(job_type)
+    submission["status"] = JobStatus.SUBMITTED.value
+    submission["timeSubmitted"] = datetime.datetime.now()
+    submission["fingerprint"] = job_fingerprint(job_type, submission)
+    leaders = await _find_leaders(collection, [submission["fingerprint"]])
+    if leaders:
+        _follow(submission, leaders[submission["fingerprint"]])
+    result = await collection.insert_one(submission)
+    if leaders:
+        await _detach_orphans(collection, [submission])
+    return result.inserted_id
+
+
+async def _find_leaders(collection, fingerprints):
+    """Find the unfinished jobs that new jobs can be coalesced with.
+
+    Returns
+    -------
+    leaders : dict
+        Maps each fingerprint that has an unfinished leader to the
+        `_id` and `status` of the oldest one.
+    """
+    cursor = collection.find(
+        {
+            "fingerprint": {"$in": fingerprints},
+            "status": {"$in": ACTIVE_STATUSES},
+            "leaderId": {"$exists": False},
+        },
+        {"fingerprint": 1, "status": 1},
+    ).sort("timeSubmitted", -1)
+    # Newest first, so the oldest leader of each fingerprint is kept
+    return {leader["fingerprint"]: leader async for leader in cursor}
+
+
+def _follow(submission, leader):
+    submission["leaderId"] = leader["_id"]
+    submission["status"] = leader["status"]
+    return
+
+
+async def _detach_orphans(collection, followers):
+    """Queue followers whose leader finished while they were inserted.
+
+    Notes
+    -----
+    The job manager copies the results of a leader to its followers when
+    it finishes. A follower inserted after that would never finish, so it
+    is detached and run by itself.
+    """
+    leader_ids = list({follower["leaderId"] for follower in followers})
+    finished = await collection.distinct(
+        "_id", {"_id": {"$in": leader_ids}, "status": {"$nin": ACTIVE_STATUSES}}
+    )
+    if finished:
+        await collection.update_many(
+            {
+                "_id": {"$in": [follower["_id"] for follower in followers]},
+                "leaderId": {"$in": finished},
+                "status": {"$in": ACTIVE_STATUSES},
+            },
+            {"$set": {"status": JobStatus.SUBMITTED.value}, "$unset": {"leaderId": ""}},
+        )
+    return
+
+
+async def cancel_job(job_type, job_id):
+    """Cancel a job that has not finished.
+
+    Notes
+    -----
+    The job manager never starts a cancelled job and stops it if it is
+    running. Jobs that follow another job, see `database.job_fingerprint`,
+    are cancelled without affecting their leader. A leader keeps running
+    for its followers once it has started, otherwise the oldest follower
+    becomes the leader of the others.
+
+    Parameters
+    ----------
+    job_type : str
+        One of "scan", "auto", "manual" or "residues".
+    job_id : str
+        ID of the job.
+
+    Returns
+    -------
+    job : dict or None
+        The fields of the job in `JOB_DETAILS_PROJECTION` after the
+        cancellation, or `None` if there is no job with this ID.
+    """
+    try:
+        object_id = ObjectId(job_id)
+    except InvalidId:
+        return None
+    collection = get_job_collection(job_type)
+    job = await collection.find_one_and_update(
+        {"_id": object_id, "status": {"$in": ACTIVE_STATUSES}},
+        {
+            "$set": {
+                "status": JobStatus.CANCELLED.value,
+                "timeCancelled": datetime.datetime.now(),
+            }
+        },
+        projection={"status": 1, "leaderId": 1},
+    )
+    if (
+        job is not None
+        and "leaderId" not in job
+        and job["status"] != JobStatus.RUNNING.value
+    ):
+        await _promote_follower(collection, object_id)
+    return await collection.find_one({"_id": object_id}, JOB_DETAILS_PROJECTION)
+
+
+async def _promote_follower(collection, leader_id):
+    follower = await collection.find_one(
+        {"leaderId": leader_id, "status": {"$in": ACTIVE_STATUSES}},
+        {"_id": 1},
+        sort=[("timeSubmitted", 1)],
+    )
+    if follower is None:
+        return
+    # The old leader may have been queued, the new one is queued afresh
+    await collection.update_one(
+        {"_id": follower["_id"]},
+        {"$set": {"status": JobStatus.SUBMITTED.value}, "$unset": {"leaderId": ""}},
+    )
+    await collection.update_many(
+        {"leaderId": leader_id, "status": {"$in": ACTIVE_STATUSES}},
+        {
+            "$set": {
+                "leaderId": follower["_id"],
+                "status": JobStatus.SUBMITTED.value,
+            }
+        },
+    )
+    return
+
+
+async def _get_job(collection, job_id, projection):
+    try:
+        object_id = ObjectId(job_id)
+    except InvalidId:
+        return None
+    return await collection.find_one({"_id": object_id}, projection)
+
+
+async def submit_scan_job(scan_submission):
+    """Submit an alanine scan job to the queue."""
+    return await _submit_job("scan", scan_submission)
+
+
+async def get_scan_job(job_id, projection=None):
+    """Get an alanine scanning job from the database."""
+    return await _get_job(ALANINE_SCAN_JOBS, job_id, projection)
+
+
+async def submit_auto_job(auto_submission):
+    """Submit an auto constellation scan job to the queue."""
+    return await _submit_job("auto", auto_submission)
+
+
+async def get_auto_job(job_id, projection=None):
+    """Get an auto constellation scan job from the database."""
+    return await _get_job(AUTO_JOBS, job_id, projection)
+
+
+async def submit_manual_job(manual_submission):
+    """Submit an manual constellation scan job to the queue."""
+    return await _submit_job("manual", manual_submission)
+
+
+async def get_manual_job(job_id, projection=None):
+    """Get an manual constellation scan job from the database."""
+    return await _get_job(MANUAL_JOBS, job_id, projection)
+
+
+async def submit_residues_job(residues_submission):
+    """Submit an residues constellation scan job to the queue."""
+    return await _submit_job("residues", residues_submission)
+
+
+async def get_residues_job(job_id, projection=None):
+    """Get an residues constellation scan job from the database."""
+    return await _get_job(RESIDUES_JOBS, job_id, projection)
+
+
+async def submit_batch(job_type, submissions, name):
+    """Submit many jobs of the same type to the queue in one insert.
+
+    Parameters
+    ----------
+    job_type : str
+        Type of all the jobs in the batch.
+    submissions : [dict]
+        Job submissions, in the same format as the single job endpoints.
+    name : str
+        Name of the batch.
+
+    Returns
+    -------
+    batch_id : bson.objectid.ObjectId
+        ID of the batch.
+    job_ids : [bson.objectid.ObjectId]
+        IDs of the jobs, in the same order as the submissions.
+    """
+    collection = get_job_collection(job_type)
+    batch_id = ObjectId()
+    time_submitted = datetime.datetime.now()
+    for submission in submissions:
+        submission["_id"] = ObjectId()
+        submission["status"] = JobStatus.SUBMITTED.value
+        submission["timeSubmitted"] = time_submitted
+        submission["batchId"] = batch_id
+        submission["fingerprint"] = job_fingerprint(job_type, submission)
+    # Repeated jobs follow an unfinished job already in the database or
+    # the first copy in the batch
+    stored_leaders = await _find_leaders(
+        collection, list({submission["fingerprint"] for submission in submissions})
+    )
+    leaders = dict(stored_leaders)
+    stored_followers = []
+    for submission in submissions:
+        leader = leaders.setdefault(submission["fingerprint"], submission)
+        if leader is not submission:
+            _follow(submission, leader)
+            if submission["fingerprint"] in stored_leaders:
+                stored_followers.append(submission)
+    await BATCHES.insert_one(
+        {
+            "_id": batch_id,
+            "name": name,
+            "jobType": job_type,
+            "jobCount": len(submissions),
+            "timeSubmitted": time_submitted,
+        }
+    )
+    result = await collection.insert_many(submissions)
+    if stored_followers:
+        await _detach_orphans(collection, stored_followers)
+    return batch_id, result.inserted_ids
+
+
+async def get_batch(batch_id):
+    """Get a batch and a count of its jobs in each state.
+
+    Returns
+    -------
+    batch : dict or None
+        The batch document with the extra field `statusCounts`, which
+        maps the `JobStatus` value to the number of jobs in that state.
+    """
+    try:
+        object_id = ObjectId(batch_id)
+    except InvalidId:
+        return None
+    batch = await BATCHES.find_one({"_id": object_id})
+    if batch is None:
+        return None
+    pipeline = [
+        {"$match": {"batchId": object_id}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+    ]
+    collection = get_job_collection(batch["jobType"])
+    batch["statusCounts"] = {
+        group["_id"]: group["count"] async for group in collection.aggregate(pipeline)
+    }
+    return batch
+
+
+async def get_batch_jobs(batch):
+    """Get the ID, name and status of every job in a batch."""
+    collection = get_job_collection(batch["jobType"])
+    cursor = collection.find({"batchId": batch["_id"]}, JOB_DETAILS_PROJECTION).sort(
+        "_id", 1
+    )
+    return [job async for job in cursor]
+
+
+async def get_job_archive(job_id):
+    """Find the archive details of a job of any type.
+
+    Notes
+    -----
+    Archives are named after the job ID, so the job type is not known
+    when one is downloaded.
+
+    Returns
+    -------
+    job : dict or None
+        The job's `archiveReady`, `archiveFile`, `archiveEvicted` and
+        `leaderId` fields, or `None` if there is no job with this ID.
+    """
+    try:
+        object_id = ObjectId(job_id)
+    except InvalidId:
+        return None
+    projection = {
+        "archiveReady": 1,
+        "archiveFile": 1,
+        "archiveEvicted": 1,
+        "leaderId": 1,
+    }
+    for collection in (ALANINE_SCAN_JOBS, AUTO_JOBS, MANUAL_JOBS, RESIDUES_JOBS):
+        job = await collection.find_one({"_id": object_id}, projection)
+        if job is not None:
+            job["collection"] = collection
+            return job
+    return None
+
+
+async def record_archive_download(job):
+    """Record when the archive of a job was last downloaded.
+
+    Parameters
+    ----------
+    job : dict
+        Job returned by `get_job_archive`.
+    """
+    await job["collection"].update_one(
+        {"_id": job["_id"]}, {"$set": {"lastDownloaded": datetime.datetime.now()}}
+    )
+    return
+
+
+async def get_queue_stats(job_type, history=50):
+    """Get the size of the queue of a job type and its recent throughput.
+
+    Notes
+    -----
+    Jobs that follow another job are not counted, as they are never run.
+
+    Parameters
+    ----------
+    job_type : str
+        One of "scan", "auto", "manual" or "residues".
+    history : int, optional
+        Number of recently completed jobs used to estimate run times.
+
+    Returns
+    -------
+    stats : dict
+        The number of `waiting` and `running` jobs, the total
+        `waitingCost` of the waiting jobs and the number, total
+        `wallSeconds` and total `estimatedCost` of the `recent` jobs.
+    """
+    collection = get_job_collection(job_type)
+    stats = {"waiting": 0, "waitingCost": 0.0, "running": 0}
+    pipeline = [
+        {
+            "$match": {
+                "status": {"$in": ACTIVE_STATUSES},
+                "leaderId": {"$exists": False},
+            }
+        },
+        {
+            "$group": {
+                "_id": "$status",
+                "count": {"$sum": 1},
+                "cost": {"$sum": "$estimatedCost"},
+            }
+        },
+    ]
+    async for group in collection.aggregate(pipeline):
+        if group["_id"] == JobStatus.RUNNING.value:
+            stats["running"] += group["count"]
+        else:
+            stats["waiting"] += group["count"]
+            stats["waitingCost"] += group["cost"]
+    pipeline = [
+        {
+            "$match": {
+                "status": JobStatus.COMPLETED.value,
+                "wallSeconds": {"$exists": True},
+            }
+        },
+        {"$sort": {"_id": -1}},
+        {"$limit": history},
+        {
+            "$group": {
+                "_id": None,
+                "count": {"$sum": 1},
+                "wallSeconds": {"$sum": "$wallSeconds"},
+                "estimatedCost": {"$sum": "$estimatedCost"},
+            }
+        },
+    ]
+    stats["recent"] = {"count": 0, "wallSeconds": 0.0, "estimatedCost": 0.0}
+    async for group in collection.aggregate(pipeline):
+        group.pop("_id")
+        stats["recent"] = group
+    return stats
+
+
+async def get_submitter_stats(since):
+    """Get the queue wait statistics of each submitter.
+
+    Parameters
+    ----------
+    since : datetime.datetime
+        Only jobs that started after this time are used for the waits.
+
+    Returns
+    -------
+    stats : [dict]
+        For each `submitter`, the number of jobs `waiting` and `running`
+        now and the number of `started` jobs, with their mean and
+        maximum wait in seconds, over all job types.
+    """
+    stats = {}
+    active_match = {
+        "status": {"$in": ACTIVE_STATUSES},
+        "leaderId": {"$exists": False},
+    }
+    started_match = {"timeStarted": {"$gte": since}, "leaderId": {"$exists": False}}
+    for job_type in ("scan", "auto", "manual", "residues"):
+        collection = get_job_collection(job_type)
+        pipeline = [
+            {"$match": active_match},
+            {
+                "$group": {
+                    "_id": {"submitter": "$submitter", "status": "$status"},
+                    "count": {"$sum": 1},
+                }
+            },
+        ]
+        async for group in collection.aggregate(pipeline):
+            submitter = _submitter_stats(stats, group["_id"].get("submitter"))
+            if group["_id"]["status"] == JobStatus.RUNNING.value:
+                submitter["running"] += group["count"]
+            else:
+                submitter["waiting"] += group["count"]
+        pipeline = [
+            {"$match": started_match},
+            {
+                "$group": {
+                    "_id": "$submitter",
+                    "count": {"$sum": 1},
+                    # Dates subtract to milliseconds
+                    "totalWait": {
+                        "$sum": {"$subtract": ["$timeStarted", "$timeSubmitted"]}
+                    },
+                    "maxWait": {
+                        "$max": {"$subtract": ["$timeStarted", "$timeSubmitted"]}
+                    },
+                }
+            },
+        ]
+        async for group in collection.aggregate(pipeline):
+            submitter = _submitter_stats(stats, group["_id"])
+            submitter["started"] += group["count"]
+            submitter["totalWaitSeconds"] += group["totalWait"] / 1000
+            submitter["maxWaitSeconds"] = max(
+                submitter["maxWaitSeconds"], group["maxWait"] / 1000
+            )
+    for submitter in stats.values():
+        total_wait = submitter.pop("totalWaitSeconds")
+        if submitter["started"]:
+            submitter["meanWaitSeconds"] = round(total_wait / submitter["started"], 1)
+        submitter["maxWaitSeconds"] = round(submitter["maxWaitSeconds"], 1)
+    return list(stats.values())
+
+
+def _submitter_stats(stats, submitter):
+    return stats.setdefault(
+        submitter,
+        {
+            "submitter": submitter,
+            "waiting": 0,
+            "running": 0,
+            "started": 0,
+            "totalWaitSeconds": 0.0,
+            "maxWaitSeconds": 0.0,
+        },
+    )
+
+
+async def get_result_files_metrics():
+    """Get the usage of the result files volume recorded by the janitor."""
+    return await METRICS.find_one({"_id": RESULT_FILES_METRICS_ID})
+
+
+async def get_job_workers(job_type):
+    """Get the number of workers the job manager runs for a job type.
+
+    Notes
+    -----
+    The counts are recorded by the job manager when it starts, one worker
+    is assumed until it has.
+    """
+    workers = await METRICS.find_one({"_id": JOB_WORKERS_METRICS_ID})
+    if workers is None:
+        return 1
+    return workers.get(job_type, 1)
@@ -0,0 +1,148 @@
+"""Contains code for turning batch requests into job submissions.
+
+Notes
+-----
+A batch request is a JSON object with a `jobType` and either a list of
+`jobs`, each in the same format as a submission to the single job
+endpoint, or an `archive` containing a base64 encoded zip file of PDB files
+along with the `parameters` shared by every job. For archives, one job is
+created per PDB file, named after the file.
+"""
+
+import base64
+import binascii
+import io
+import pathlib
+import zipfile
+
+# Fields that must be present in every submission of each job type
+REQUIRED_FIELDS = {
+    "scan": ("name", "pdbFile", "receptor", "ligand", "rotamerFixActive"),
+    "auto": (
+        "name",
+        "scanName",
+        "pdbFile",
+        "receptor",
+        "ligand",
+        "ddGCutOff",
+        "constellationSize",
+        "cutOffDistance",
+        "rotamerFixActive",
+    ),
+    "manual": (
+        "name",
+        "scanName",
+        "pdbFile",
+        "receptor",
+        "ligand",
+        "residues",
+        "rotamerFixActive",
+    ),
+    "residues": (
+        "name",
+        "scanName",
+        "pdbFile",
+        "receptor",
+        "ligand",
+        "constellationSize",
+        "residues",
+        "rotamerFixActive",
+    ),
+}
+PDB_SUFFIXES = (".pdb", ".ent")
+MAX_BATCH_SIZE = 1000
+MAX_ARCHIVE_BYTES = 200 * 1024 * 1024
+
+
+class BatchError(ValueError):
+    """Raised when a batch request is not valid."""
+
+
+def make_submissions(batch_request):
+    """Create the job submissions for a batch request.
+
+    Parameters
+    ----------
+    batch_request : dict
+        Decoded JSON body of the batch request.
+
+    Returns
+    -------
+    job_type : str
+        The type of the jobs in the batch.
+    submissions : [dict]
+        A submission for each job in the batch.
+
+    Raises
+    ------
+    BatchError
+        If the request is malformed or any of the jobs are missing
+        required fields.
+    """
+    if not isinstance(batch_request, dict):
+        raise BatchError("The batch request must be a JSON object.")
+    job_type = batch_request.get("jobType")
+    if job_type not in REQUIRED_FIELDS:
+        raise BatchError(f"`jobType` must be one of {', '.join(REQUIRED_FIELDS)}.")
+    if "jobs" in batch_request:
+        submissions = batch_request["jobs"]
+        if not isinstance(submissions, list) or not all(
+            isinstance(job, dict) for job in submissions
+        ):
+            raise BatchError("`jobs` must be a list of job submissions.")
+    elif "archive" in batch_request:
+        submissions = submissions_from_archive(
+            batch_request["archive"], batch_request.get("parameters", {}), job_type
+        )
+    else:
+        raise BatchError("The batch request must contain `jobs` or an `archive`.")
+    if not submissions:
+        raise BatchError("The batch does not contain any jobs.")
+    if len(submissions) > MAX_BATCH_SIZE:
+        raise BatchError(f"Batches are limited to {MAX_BATCH_SIZE} jobs.")
+    for i, submission in enumerate(submissions):
+        missing = [
+            field for field in REQUIRED_FIELDS[job_type] if field not in submission
+        ]
+        if missing:
+            raise BatchError(f"Job {i} is missing: {', '.join(missing)}.")
+    return job_type, submissions
+
+
+def submissions_from_archive(encoded_archive, parameters, job_type):
+    """Create a submission for every PDB file in a zip archive.
+
+    Parameters
+    ----------
+    encoded_archive : str
+        Base64 encoded zip file.
+    parameters : dict
+        Fields shared by all the jobs, such as `receptor` and `ligand`.
+    job_type : str
+        The type of the jobs in the batch.
+    """
+    if not isinstance(parameters, dict):
+        raise BatchError("`parameters` must be a JSON object.")
+    try:
+        archive = zipfile.ZipFile(io.BytesIO(base64.b64decode(encoded_archive)))
+    except (binascii.Error, TypeError, zipfile.BadZipFile):
+        raise BatchError("`archive` must be a base64 encoded zip file.")
+    submissions = []
+    with archive:
+        if sum(info.file_size for info in archive.infolist()) > MAX_ARCHIVE_BYTES:
+            raise BatchError("The uncompressed archive is too large.")
+        for info in sorted(archive.infolist(), key=lambda x: x.filename):
+            path = pathlib.PurePosixPath(info.filename)
+            if (
+                info.is_dir()
+                or path.name.startswith(".")
+                or path.suffix.lower() not in PDB_SUFFIXES
+            ):
+                continue
+            submission = dict(parameters)
+            submission["name"] = path.stem
+            if job_type != "scan":
+                submission.setdefault("scanName", path.stem)
+            submission["pdbFile"] = archive.read(info).decode(errors="replace")
+            submissions.append(submission)
+    return submissions
@@ -2,9 +2,10 @@
 
 import datetime
 from enum import Enum, auto
+import hashlib
+import json
 import os
 
-from bson.objectid import ObjectId
 import pymongo
 
 db_name = os.environ["BALAS_DB_NAME"]
@@ -15,68 +16,74 @@ ALANINE_SCAN_JOBS = CLIENT.bals.alanine_scan_jobs
 AUTO_JOBS = CLIENT.bals.auto_contellation_jobs
 MANUAL_JOBS = CLIENT.bals.manual_contellation_jobs
 RESIDUES_JOBS = CLIENT.bals.residues_contellation_jobs
-
-
-def submit_scan_job(scan_submission):
-    """Submit an alanine scan job to the queue."""
-    scan_submission["status"] = JobStatus.SUBMITTED.value
-    scan_submission["timeSubmitted"] = datetime.datetime.now()
-    job_id = ALANINE_SCAN_JOBS.insert_one(scan_submission).inserted_id
-    return job_id
-
-
-def get_scan_job(job_id):
-    """Get an alanine scanning job from the database."""
-    scan_job = ALANINE_SCAN_JOBS.find_one({"_id": ObjectId(job_id)})
-    return scan_job
-
-
-def submit_auto_job(auto_submission):
-    """Submit an auto constellation scan job to the queue."""
-    auto_submission["status"] = JobStatus.SUBMITTED.value
-    auto_submission["timeSubmitted"] = datetime.datetime.now()
-    job_id = AUTO_JOBS.insert_one(auto_submission).inserted_id
-    return job_id
-
-
-def get_auto_job(job_id):
-    """Get an auto constellation scan job from the database."""
-    auto_job = AUTO_JOBS.find_one({"_id": ObjectId(job_id)})
-    return auto_job
-
-
-def submit_manual_job(manual_submission):
-    """Submit an manual constellation scan job to the queue."""
-    manual_submission["status"] = JobStatus.SUBMITTED.value
-    manual_submission["timeSubmitted"] = datetime.datetime.now()
-    job_id = MANUAL_JOBS.insert_one(manual_submission).inserted_id
-    return job_id
-
-
-def get_manual_job(job_id):
-    """Get an manual constellation scan job from the database."""
-    manual_job = MANUAL_JOBS.find_one({"_id": ObjectId(job_id)})
-    return manual_job
-
-
-def submit_residues_job(residues_submission):
-    """Submit an residues constellation scan job to the queue."""
-    residues_submission["status"] = JobStatus.SUBMITTED.value
-    residues_submission["timeSubmitted"] = datetime.datetime.now()
-    job_id = RESIDUES_JOBS.insert_one(residues_submission).inserted_id
-    return job_id
-
-
-def get_residues_job(job_id):
-    """Get an residues constellation scan job from the database."""
-    residues_job = RESIDUES_JOBS.find_one({"_id": ObjectId(job_id)})
-    return residues_job
+JOB_COLLECTIONS = [ALANINE_SCAN_JOBS, AUTO_JOBS, MANUAL_JOBS, RESIDUES_JOBS]
+BATCHES = CLIENT.bals.batches
+METRICS = CLIENT.bals.metrics
+# Document in `METRICS` with the usage of the result files volume, it is
+# written by the job manager's janitor
+RESULT_FILES_METRICS_ID = "result-files"
+# Document in `METRICS` with the number of workers for each job type, it is
+# written by the job manager when it starts
+JOB_WORKERS_METRICS_ID = "job-workers"
+
+
+def create_indexes():
+    """Create the indexes used to find and order jobs in the queue.
+
+    Notes
+    -----
+    `create_index` is a no-op if the index already exists, so this is
+    safe to call every time the job manager starts.
+    """
+    for collection in JOB_COLLECTIONS:
+        collection.create_index(
+            [("status", pymongo.ASCENDING), ("timeSubmitted", pymongo.ASCENDING)]
+        )
+        collection.create_index(
+            [
+                ("status", pymongo.ASCENDING),
+                ("submitter", pymongo.ASCENDING),
+                ("timeSubmitted", pymongo.ASCENDING),
+            ]
+        )
+        collection.create_index("batchId", sparse=True)
+        collection.create_index("fingerprint", sparse=True)
+        collection.create_index("leaderId", sparse=True)
+        collection.create_index("timeStarted", sparse=True)
+        collection.create_index("postProcessing.state", sparse=True)
+    return
+
+
+# Fields needed by `export_job_details`
+JOB_DETAILS_PROJECTION = {
+    "name": 1,
+    "status": 1,
+    "std_out": 1,
+    "archiveReady": 1,
+    "archiveFile": 1,
+    "archiveEvicted": 1,
+    "failureReason": 1,
+}
 
 
 def export_job(job):
-    """Convert job to an exportable format."""
+    """Convert job to an exportable format.
+
+    Notes
+    -----
+    IDs and times, such as `timeSubmitted` and `timeStarted`, are converted
+    to strings so that the job can be encoded as JSON. The hashed ID of the
+    submitter and the job manager's post-processing state are not exported.
+    """
+    job.pop("submitter", None)
+    job.pop("postProcessing", None)
     job["_id"] = str(job["_id"])
-    job["timeSubmitted"] = str(job["timeSubmitted"])
+    for field in ("batchId", "leaderId"):
+        if field in job:
+            job[field] = str(job[field])
+    for field, value in job.items():
+        if isinstance(value, datetime.datetime):
+            job[field] = str(value)
     return job
 
 
@@ -85,9 +92,45 @@ def export_job_details(job):
     job_details = {"_id": str(job["_id"]), "name": job["name"], "status": job["status"]}
     if "std_out" in job:
         job_details["std_out"] = job["std_out"]
+    for field in ("archiveReady", "archiveFile", "archiveEvicted", "failureReason"):
+        if field in job:
+            job_details[field] = job[field]
     return job_details
 
 
+def export_batch(batch, jobs=None):
+    """Create batch progress details from a batch.
+
+    Parameters
+    ----------
+    batch : dict
+        Batch document including the `statusCounts` of its jobs.
+    jobs : [dict], optional
+        Jobs in the batch, if they should be included.
+    """
+    status_counts = {
+        status.name: batch["statusCounts"].get(status.value, 0) for status in JobStatus
+    }
+    finished = (
+        status_counts["COMPLETED"]
+        + status_counts["FAILED"]
+        + status_counts["CANCELLED"]
+    )
+    batch_details = {
+        "_id": str(batch["_id"]),
+        "name": batch["name"],
+        "jobType": batch["jobType"],
+        "jobCount": batch["jobCount"],
+        "timeSubmitted": str(batch["timeSubmitted"]),
+        "statusCounts": status_counts,
+        "finished": finished,
+        "complete": finished == batch["jobCount"],
+    }
+    if jobs is not None:
+        batch_details["jobs"] = [export_job_details(job) for job in jobs]
+    return batch_details
+
+
 class JobStatus(Enum):
     """Represents the possible states of a job."""
 
@@ -96,3 +139,98 @@ class JobStatus(Enum):
     RUNNING = auto()
     COMPLETED = auto()
     FAILED = auto()
+    CANCELLED = auto()
+
+
+# States of jobs that have not finished, jobs can only be coalesced with a
+# job in one of these states and only these jobs can be cancelled
+ACTIVE_STATUSES = [
+    JobStatus.SUBMITTED.value,
+    JobStatus.QUEUED.value,
+    JobStatus.RUNNING.value,
+]
+# Fields of each job type that determine its results
+FINGERPRINT_FIELDS = {
+    "scan": ("pdbFile", "receptor", "ligand", "rotamerFixActive"),
+    "auto": (
+        "scanName",
+        "pdbFile",
+        "receptor",
+        "ligand",
+        "ddGCutOff",
+        "constellationSize",
+        "cutOffDistance",
+        "rotamerFixActive",
+    ),
+    "manual": (
+        "scanName",
+        "pdbFile",
+        "receptor",
+        "ligand",
+        "residues",
+        "rotamerFixActive",
+    ),
+    "residues": (
+        "scanName",
+        "pdbFile",
+        "receptor",
+        "ligand",
+        "constellationSize",
+        "residues",
+        "rotamerFixActive",
+    ),
+}
+
+
+def job_fingerprint(job_type, submission):
+    """Create a fingerprint of the computation requested by a job.
+
+    Notes
+    -----
+    Jobs with the same fingerprint produce the same results, so a job
+    submitted while another job with its fingerprint is unfinished follows
+    that job, the leader, rather than being run. Chains and residues are
+    compared without regard to order or case and the PDB file without
+    regard to line endings or trailing whitespace.
+
+    Parameters
+    ----------
+    job_type : str
+        One of "scan", "auto", "manual" or "residues".
+    submission : dict
+        Job submission, it must contain the required fields of its type.
+
+    Returns
+    -------
+    fingerprint : str
+        Hex digest of the canonical form of the job.
+    """
+    canonical = {"jobType": job_type}
+    for field in FINGERPRINT_FIELDS[job_type]:
+        value = submission[field]
+        if field == "pdbFile":
+            value = hashlib.sha256(
+                "\n".join(line.rstrip() for line in value.splitlines()).encode()
+            ).hexdigest()
+        elif field in ("receptor", "ligand", "residues"):
+            value = sorted({item.upper() for item in value})
+        elif field in ("ddGCutOff", "cutOffDistance"):
+            value = float(value)
+        canonical[field] = value
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode()).hexdigest()
+
+
+def job_and_followers(job_id):
+    """Create a query for a job and the unfinished jobs that follow it.
+
+    Notes
+    -----
+    A cancelled job is left cancelled, even if it is still being run
+    for its followers.
+    """
+    return {
+        "$or": [
+            {"_id": job_id, "status": {"$ne": JobStatus.CANCELLED.value}},
+            {"leaderId": job_id, "status": {"$in": ACTIVE_STATUSES}},
+        ]
+    }
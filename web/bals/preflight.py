@@ -0,0 +1,282 @@
+"""Contains the checks run on job submissions before they are queued.
+
+Notes
+-----
+The scan checks the chains, residues and constellation sizes of a job only
+once a worker has started `budeAlaScan`, so an invalid job waits in the
+queue and takes a worker slot before it fails. `check_submission` runs the
+same checks in the web tier and rejects the job straight away. The PDB file
+is read with a fixed column parse of its `ATOM` records rather than AMPAL,
+which keeps the checks to a few milliseconds even for large ensembles.
+
+The checks also estimate the cost of the job, as the number of BUDE runs
+multiplied by the number of receptor and ligand heavy atom pairs, in
+millions. Jobs with an estimated cost above `PREFLIGHT_MAX_COST` are
+rejected and the estimate of accepted jobs is stored as `estimatedCost`.
+"""
+
+import math
+
+from bals import batches
+
+STANDARD_RESIDUES = frozenset(
+    (
+        "ALA",
+        "ARG",
+        "ASN",
+        "ASP",
+        "CYS",
+        "GLN",
+        "GLU",
+        "GLY",
+        "HIS",
+        "ILE",
+        "LEU",
+        "LYS",
+        "MET",
+        "PHE",
+        "PRO",
+        "SER",
+        "THR",
+        "TRP",
+        "TYR",
+        "VAL",
+        "SEC",
+    )
+)
+# Default of `MaxAutoNumber` in the budeAlaScan ini file, the number of
+# constellations built by auto jobs
+MAX_AUTO_CONSTELLATIONS = 20
+CONSTELLATION_MODES = ("auto", "manual", "residues")
+
+
+class PreflightError(ValueError):
+    """Raised when a job submission would fail in the scan."""
+
+
+class PdbSummary:
+    """The parts of a PDB file needed to check a job submission.
+
+    Attributes
+    ----------
+    model_count : int
+        Number of models, 1 if the file has no `MODEL` records.
+    residues : {str: set(str)}
+        Residue numbers, with insertion codes, of each chain of the
+        first model.
+    heavy_atoms : {str: int}
+        Number of heavy atoms of each chain of the first model.
+    non_standard : set(str)
+        Names of any non standard residues in the `ATOM` records.
+    """
+
+    def __init__(self, pdb_string):
+        self.model_count = 0
+        self.residues = {}
+        self.heavy_atoms = {}
+        self.non_standard = set()
+        first_model = True
+        for line in pdb_string.splitlines():
+            if line.startswith("MODEL"):
+                self.model_count += 1
+            elif line.startswith("ENDMDL"):
+                first_model = False
+            elif line.startswith("ATOM"):
+                residue_name = line[17:20].strip()
+                if residue_name not in STANDARD_RESIDUES:
+                    self.non_standard.add(residue_name)
+                if first_model:
+                    chain = line[21:22].strip()
+                    self.residues.setdefault(chain, set()).add(
+                        line[22:26].strip() + line[26:27].strip()
+                    )
+                    element = line[76:78].strip() or line[12:16].strip()[:1]
+                    if element.upper() != "H":
+                        self.heavy_atoms[chain] = self.heavy_atoms.get(chain, 0) + 1
+        self.model_count = max(self.model_count, 1)
+
+
+def check_submission(job_type, submission, max_cost=float("inf")):
+    """Checks that a job submission can be run.
+
+    Parameters
+    ----------
+    job_type : str
+        One of "scan", "auto", "manual" or "residues".
+    submission : dict
+        Decoded JSON body of the job submission.
+    max_cost : float, optional
+        Largest estimated cost accepted.
+
+    Returns
+    -------
+    estimated_cost : float
+        Estimated cost of the job.
+
+    Raises
+    ------
+    PreflightError
+        If the submission is malformed or the scan would reject it.
+    """
+    if not isinstance(submission, dict):
+        raise PreflightError("The job submission must be a JSON object.")
+    missing = [
+        field for field in batches.REQUIRED_FIELDS[job_type] if field not in submission
+    ]
+    if missing:
+        raise PreflightError(f"The job is missing: {', '.join(missing)}.")
+    if not isinstance(submission["pdbFile"], str):
+        raise PreflightError("`pdbFile` must be the contents of a PDB file.")
+    pdb = PdbSummary(submission["pdbFile"])
+    if len(pdb.residues) < 2:
+        raise PreflightError("The PDB file must contain at least two chains.")
+    if pdb.non_standard:
+        raise PreflightError(
+            "The PDB file contains non standard residues: "
+            f"{', '.join(sorted(pdb.non_standard))}."
+        )
+    receptor = check_chains(pdb, submission["receptor"], "receptor")
+    ligand = check_chains(pdb, submission["ligand"], "ligand")
+    if set(receptor) & set(ligand):
+        raise PreflightError("The receptor and ligand must not share chains.")
+
+    constellation_count = 0
+    if job_type == "auto":
+        if not is_number(submission["ddGCutOff"]) or submission["ddGCutOff"] <= 0:
+            raise PreflightError("`ddGCutOff` must be a positive number.")
+        if not is_number(submission["cutOffDistance"]):
+            raise PreflightError("`cutOffDistance` must be a number.")
+        check_constellation_size(submission["constellationSize"])
+        constellation_count = MAX_AUTO_CONSTELLATIONS
+    elif job_type == "manual":
+        check_residues(pdb, submission["residues"], ligand, 1)
+        constellation_count = 1
+    elif job_type == "residues":
+        size = check_constellation_size(submission["constellationSize"])
+        residues = check_residues(pdb, submission["residues"], ligand, 2)
+        if size > len(residues):
+            raise PreflightError(
+                "`constellationSize` cannot be larger than the number of residues."
+            )
+        constellation_count = min(
+            math.comb(len(residues), size), MAX_AUTO_CONSTELLATIONS
+        )
+
+    estimated_cost = estimate_cost(
+        pdb,
+        receptor,
+        ligand,
+        job_type in CONSTELLATION_MODES,
+        constellation_count,
+    )
+    if estimated_cost > max_cost:
+        raise PreflightError(
+            f"The job is too large, its estimated cost is {estimated_cost:.1f} "
+            f"and the limit is {max_cost:.1f}."
+        )
+    return estimated_cost
+
+
+def check_batch(job_type, submissions, max_cost=float("inf")):
+    """Checks the job submissions of a batch, see `check_submission`.
+
+    Returns
+    -------
+    estimated_costs : [float]
+        Estimated cost of each job.
+
+    Raises
+    ------
+    PreflightError
+        For the first submission that cannot be run, giving its index.
+    """
+    estimated_costs = []
+    for i, submission in enumerate(submissions):
+        try:
+            estimated_costs.append(check_submission(job_type, submission, max_cost))
+        except PreflightError as error:
+            raise PreflightError(f"Job {i}: {error}") from error
+    return estimated_costs
+
+
+def is_number(value):
+    """True if a decoded JSON value is a number."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def check_chains(pdb, chains, unit_name):
+    """Checks the chains of a docking unit and returns them as a list."""
+    if isinstance(chains, str):
+        chains = list(chains)
+    if (
+        not isinstance(chains, list)
+        or not chains
+        or not all(isinstance(chain, str) for chain in chains)
+    ):
+        raise PreflightError(f"`{unit_name}` must be a list of chain IDs.")
+    missing = [chain for chain in chains if chain.upper() not in pdb.residues]
+    if missing:
+        raise PreflightError(
+            f"Chain(s) {', '.join(missing)} of the {unit_name} could not be found "
+            "in the PDB file."
+        )
+    return [chain.upper() for chain in chains]
+
+
+def check_constellation_size(size):
+    """Checks and returns the constellation size of a job."""
+    if not isinstance(size, int) or isinstance(size, bool) or size < 2:
+        raise PreflightError("`constellationSize` must be an integer of at least 2.")
+    return size
+
+
+def check_residues(pdb, residues, ligand, min_count):
+    """Checks that residues, such as "B52", are in the ligand chains.
+
+    Returns
+    -------
+    residues : [str]
+        The residues without duplicates.
+    """
+    if not isinstance(residues, list) or not all(
+        isinstance(residue, str) and len(residue) > 1 for residue in residues
+    ):
+        raise PreflightError("`residues` must be a list of residues, such as B52.")
+    residues = list(dict.fromkeys(residue.upper() for residue in residues))
+    if len(residues) < min_count:
+        raise PreflightError(f"At least {min_count} residue(s) must be selected.")
+    for residue in residues:
+        chain = residue[0]
+        if chain not in ligand:
+            raise PreflightError(
+                f"Chain {chain} of residue {residue} is not a ligand chain."
+            )
+        if residue[1:] not in pdb.residues[chain]:
+            raise PreflightError(
+                f"Residue {residue[1:]} could not be found in chain {chain}."
+            )
+    return residues
+
+
+def estimate_cost(pdb, receptor, ligand, is_constellation, constellation_count):
+    """Estimates the cost of a job.
+
+    Notes
+    -----
+    Every model is scanned once for the single mutants and, for the
+    constellation modes, once more for the wild type and once for each
+    constellation. Each BUDE run scores every receptor and ligand heavy
+    atom pair.
+
+    Returns
+    -------
+    estimated_cost : float
+        BUDE runs times heavy atom pairs, in millions.
+    """
+    runs_per_model = 1
+    if is_constellation:
+        runs_per_model += 1 + constellation_count
+    atom_pairs = sum(pdb.heavy_atoms.get(chain, 0) for chain in receptor) * sum(
+        pdb.heavy_atoms.get(chain, 0) for chain in ligand
+    )
+    return pdb.model_count * runs_per_model * atom_pairs / 1e6
@@ -0,0 +1,176 @@
+"""Contains helpers for streaming job results to the client.
+
+Notes
+-----
+Results of completed jobs never change, so they are served with a strong
+ETag and long lived cache headers. The fields that track the job's archive
+are still updated after the job has completed, so they are left out of the
+results and are only returned with the job's status. The JSON body is encoded incrementally and
+compressed chunk by chunk, so the full response is never held in memory as a
+single string.
+"""
+
+import hashlib
+import json
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+CHUNK_SIZE = 64 * 1024
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Fields that are always returned, as they are needed to identify the job
+# and check that the results are complete.
+REQUIRED_FIELDS = ("_id", "status")
+# Fields that change after a job has completed, as its archive is built,
+# downloaded and removed.
+MUTABLE_FIELDS = (
+    "archiveReady",
+    "archiveFile",
+    "archiveEvicted",
+    "archiveEvictedAt",
+    "lastDownloaded",
+    "postProcessing",
+)
+
+
+def parse_fields(fields_arg):
+    """Converts the `fields` query argument into a list of field paths.
+
+    Notes
+    -----
+    Paths can refer to embedded fields using dots, for example
+    `scanResults.dG`. Paths that are already covered by a shorter path
+    are removed, as MongoDB rejects projections with overlapping paths.
+
+    Parameters
+    ----------
+    fields_arg : str or None
+        Comma separated list of field paths.
+
+    Returns
+    -------
+    fields : [str] or None
+        Sorted field paths, or `None` if all fields should be returned.
+    """
+    if not fields_arg:
+        return None
+    paths = sorted({path.strip() for path in fields_arg.split(",") if path.strip()})
+    fields = []
+    for path in paths:
+        if not any(path.startswith(f"{parent}.") for parent in fields):
+            fields.append(path)
+    return fields or None
+
+
+def make_projection(fields):
+    """Creates a MongoDB projection for the requested fields.
+
+    Notes
+    -----
+    The `MUTABLE_FIELDS` are never included, even if they are requested.
+    """
+    if fields is None:
+        return {field: 0 for field in MUTABLE_FIELDS}
+    projection = {
+        field: 1 for field in fields if field.split(".")[0] not in MUTABLE_FIELDS
+    }
+    for field in REQUIRED_FIELDS:
+        projection[field] = 1
+    return projection
+
+
+def select_encoding(accept_encoding):
+    """Picks the best content coding supported by both ends.
+
+    Parameters
+    ----------
+    accept_encoding : str
+        Value of the `Accept-Encoding` request header.
+
+    Returns
+    -------
+    encoding : str or None
+        `"zstd"`, `"gzip"` or `None` for an uncompressed response.
+    """
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.lower()] = quality
+    if zstandard is not None and accepted.get("zstd", 0) > 0:
+        return "zstd"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+
+def make_etag(job_id, fields, encoding):
+    """Creates a strong ETag for a representation of a job's results."""
+    fields_key = ",".join(fields) if fields else "*"
+    digest = hashlib.sha1(f"{fields_key}:{encoding}".encode()).hexdigest()[:16]
+    return f'"{job_id}-{digest}"'
+
+
+def etag_matches(if_none_match, etag):
+    """Checks if an `If-None-Match` header matches the ETag."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _make_compressor(encoding):
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    if encoding == "gzip":
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    return None
+
+
+async def stream_json(document, encoding=None):
+    """Encodes a document as JSON in compressed chunks.
+
+    Parameters
+    ----------
+    document : dict
+        JSON serialisable document.
+    encoding : str or None
+        Content coding returned by `select_encoding`.
+
+    Yields
+    ------
+    chunk : bytes
+        Part of the encoded response body.
+    """
+    compressor = _make_compressor(encoding)
+    buffer = []
+    buffered = 0
+    for part in json.JSONEncoder().iterencode(document):
+        buffer.append(part)
+        buffered += len(part)
+        if buffered >= CHUNK_SIZE:
+            data = "".join(buffer).encode()
+            buffer = []
+            buffered = 0
+            if compressor is None:
+                yield data
+            else:
+                compressed = compressor.compress(data)
+                if compressed:
+                    yield compressed
+    data = "".join(buffer).encode()
+    if compressor is None:
+        if data:
+            yield data
+    else:
+        yield compressor.compress(data) + compressor.flush()
@@ -7,132 +7,416 @@ is contained in the Elm application, with this file only really serving the base
 html and providing the RESTful API backend.
 """
 
+import asyncio
+import datetime
+import hashlib
+import hmac
+import math
+import pathlib
+import re
 import sys
 
-import flask
-from flask import render_template, request
-from flask_restful import Resource, Api
+from quart import Response, abort, render_template, request, send_file
+from quart.views import MethodView
 
+from bals import admission
 from bals import app
+from bals import async_database
+from bals import batches
 from bals import database
+from bals import preflight
+from bals import streaming
+
+
+@app.before_serving
+async def connect_to_database():
+    """Opens the database connection pool for this worker."""
+    if not app.config["SUBMITTER_SECRET"]:
+        raise RuntimeError(
+            "BALAS_SUBMITTER_SECRET must be set, it is used to hash the "
+            "addresses of submitters."
+        )
+    async_database.connect(
+        app.config["DB_MAX_POOL_SIZE"], app.config["DB_MIN_POOL_SIZE"]
+    )
+
+
+@app.after_serving
+async def disconnect_from_database():
+    """Closes the database connection pool for this worker."""
+    async_database.close()
 
 
 @app.route("/", defaults={"path": ""})
 @app.route("/<path:path>")
-def home(path):
+async def home(path):
     """Returns the home page for the bals web app."""
-    return render_template("index.html")
+    return await render_template("index.html")
 
 
 # RESTful API
 
 
-API = Api(app)
+async def results_response(job_id, get_job):
+    """Creates a streamed, compressed response containing a job's results.
+
+    Notes
+    -----
+    The `fields` query argument can be used to select a subset of the
+    job's fields, for example `?get-results&fields=dG,receptorData`.
+    Dotted paths select embedded fields. The job's `_id` and `status`
+    are always included. As the results of a completed job never change,
+    the response can be cached and repeat requests with a matching
+    `If-None-Match` header receive a 304. The state of the job's archive
+    is not included, as it changes after the job has completed, it is
+    part of the job's status.
+
+    Parameters
+    ----------
+    job_id : str
+        ID of the job.
+    get_job : coroutine function
+        Function from `async_database` used to get the job.
+    """
+    fields = streaming.parse_fields(request.args.get("fields"))
+    encoding = streaming.select_encoding(request.headers.get("Accept-Encoding", ""))
+    etag = streaming.make_etag(job_id, fields, encoding)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": streaming.CACHE_CONTROL,
+        "Vary": "Accept-Encoding",
+    }
+    if streaming.etag_matches(request.headers.get("If-None-Match"), etag):
+        job = await get_job(job_id, {"status": 1})
+        if job is not None and job["status"] == database.JobStatus.COMPLETED.value:
+            return "", 304, headers
+    job = await get_job(job_id, streaming.make_projection(fields))
+    if job is None or job["status"] != database.JobStatus.COMPLETED.value:
+        abort(404)
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(
+        streaming.stream_json(database.export_job(job), encoding),
+        mimetype="application/json",
+        headers=headers,
+    )
+
+
+async def cancel_response(job_type, job_id):
+    """Cancels a job and creates a response with its status details.
+
+    Notes
+    -----
+    Jobs that have already finished cannot be cancelled, a 409 response
+    is returned for them.
+
+    Parameters
+    ----------
+    job_type : str
+        One of "scan", "auto", "manual" or "residues".
+    job_id : str
+        ID of the job.
+    """
+    job = await async_database.cancel_job(job_type, job_id)
+    if job is None:
+        abort(404)
+    if job["status"] != database.JobStatus.CANCELLED.value:
+        return {"message": "The job has already finished."}, 409
+    if app.debug:
+        print(f"Cancelled {job_type} job {job_id}.", file=sys.stderr)
+    return database.export_job_details(job), 200
+
+
+async def log_response(job_id, get_job):
+    """Creates a response containing the full output log of a job.
+
+    Notes
+    -----
+    Only the end of the output is stored in the job document, the full
+    log is written to the result files directory by the job manager.
+
+    Parameters
+    ----------
+    job_id : str
+        ID of the job.
+    get_job : coroutine function
+        Function from `async_database` used to get the job.
+    """
+    job = await get_job(job_id, {"status": 1, "leaderId": 1})
+    if job is None:
+        abort(404)
+    # Coalesced jobs share the log of the job that was run
+    log_id = job.get("leaderId", job["_id"])
+    log_path = pathlib.Path(app.config["RESULT_FILES_DIR"]) / f"{log_id}.log"
+    if not log_path.exists():
+        abort(404)
+    return await send_file(
+        log_path,
+        mimetype="text/plain",
+        as_attachment=True,
+        download_name=log_path.name,
+    )
+
+
+ARCHIVE_NAME_PATTERN = re.compile(r"^([0-9a-f]{24})\.(zip|tar\.zst)$")
+ARCHIVE_MIMETYPES = {"zip": "application/zip", "tar.zst": "application/zstd"}
+
+
+class ResultFile(MethodView):
+    """Downloads of the archive of a job's output."""
+
+    async def get(self, file_name):
+        """Returns the archive of a job's output.
 
+        Notes
+        -----
+        The time of the download is recorded, as archives are removed in
+        least recently downloaded order when the result files volume is
+        full. The file itself is sent by nginx, using the path given in
+        the `X-Accel-Redirect` header. If the archive has been removed, a
+        410 response is returned. Jobs that were coalesced with another
+        job are sent the archive of that job.
+        """
+        match = ARCHIVE_NAME_PATTERN.match(file_name)
+        if match is None:
+            abort(404)
+        job = await async_database.get_job_archive(match.group(1))
+        if job is not None and "leaderId" in job:
+            # Coalesced jobs share the archive of the job that was run
+            job = await async_database.get_job_archive(job["leaderId"])
+        if job is None:
+            abort(404)
+        if job.get("archiveEvicted"):
+            return {"message": "The archive of this job has been removed."}, 410
+        archive_file = job.get("archiveFile", f"{job['_id']}.zip")
+        if not archive_file.endswith(f".{match.group(2)}") or not job.get(
+            "archiveReady", True
+        ):
+            abort(404)
+        await async_database.record_archive_download(job)
+        internal_uri = app.config["RESULT_FILES_INTERNAL_URI"]
+        if internal_uri is None:
+            return await send_file(
+                pathlib.Path(app.config["RESULT_FILES_DIR"]) / archive_file,
+                mimetype=ARCHIVE_MIMETYPES[match.group(2)],
+                as_attachment=True,
+                download_name=file_name,
+            )
+        return Response(
+            "",
+            mimetype=ARCHIVE_MIMETYPES[match.group(2)],
+            headers={
+                "X-Accel-Redirect": f"{internal_uri}/{archive_file}",
+                "Content-Disposition": f'attachment; filename="{file_name}"',
+            },
+        )
+
+
+class QueueStatus(MethodView):
+    """RESTful API endpoint for the state of the job queues."""
+
+    async def get(self):
+        """Returns the number of waiting and running jobs of each job type.
 
-class AlanineScanJobs(Resource):
+        Notes
+        -----
+        The estimated wait of a new job is included, along with the
+        limits above which submissions are rejected, see `bals.admission`.
+        """
+        queues = {}
+        for job_type in batches.REQUIRED_FIELDS:
+            queues[job_type] = admission.queue_status(
+                await async_database.get_queue_stats(job_type),
+                app.config["ADMISSION_DEFAULT_JOB_SECONDS"],
+                await async_database.get_job_workers(job_type),
+            )
+        limits = {
+            "maxQueued": app.config["ADMISSION_MAX_QUEUED"],
+            "maxWaitSeconds": app.config["ADMISSION_MAX_WAIT_SECONDS"],
+        }
+        return {
+            "queues": queues,
+            "limits": {
+                key: value for key, value in limits.items() if math.isfinite(value)
+            },
+        }, 200
+
+
+class SubmitterStats(MethodView):
+    """RESTful API endpoint for the queue waits of each submitter."""
+
+    async def get(self):
+        """Returns the waiting and running jobs and queue waits of submitters.
+
+        Notes
+        -----
+        The waits are for jobs that started in the last
+        `SUBMITTER_STATS_HOURS` hours. Only the statistics of the submitter
+        making the request are returned, along with the totals over all
+        submitters, so the IDs of other submitters are never shown.
+        """
+        since = datetime.datetime.now() - datetime.timedelta(
+            hours=app.config["SUBMITTER_STATS_HOURS"]
+        )
+        stats = await async_database.get_submitter_stats(since)
+        submitter = submitter_id()
+        own_stats = next(
+            (entry for entry in stats if entry["submitter"] == submitter),
+            {"submitter": submitter, "waiting": 0, "running": 0, "started": 0},
+        )
+        return {
+            "hours": app.config["SUBMITTER_STATS_HOURS"],
+            "submitter": own_stats,
+            "totals": submitter_totals(stats),
+        }, 200
+
+
+class ResultFilesUsage(MethodView):
+    """RESTful API endpoint for the usage of the result files volume."""
+
+    async def get(self):
+        """Returns the usage recorded by the job manager's janitor."""
+        metrics = await async_database.get_result_files_metrics()
+        if metrics is None:
+            abort(404)
+        metrics.pop("_id")
+        metrics["lastRun"] = str(metrics["lastRun"])
+        return metrics, 200
+
+
+class AlanineScanJobs(MethodView):
     """RESTful API endpoint for posting scan jobs and getting aggregate data."""
 
-    def post(self):
+    async def post(self):
         """Creates a new alanine scan job on the server.
 
         Returns
         -------
         job_details : Dict
-            Dict containing the ID of the job, time submitted and the
-            current job status.
+            Dict containing the ID of the job, time submitted, the
+            current job status and the estimated start time. If the
+            queue is full, a 429 response is returned instead, see
+            `bals.admission`.
         """
-        scan_submission = request.json
+        scan_submission = await request.get_json()
+        error_response = await run_preflight("scan", scan_submission)
+        if error_response is not None:
+            return error_response
+        scan_submission["submitter"] = submitter_id()
+        queue_status, error_response = await admit("scan")
+        if error_response is not None:
+            return error_response
         if app.debug:
             print("Submitting Scan Job...", file=sys.stderr)
-        job_id = database.submit_scan_job(scan_submission)
-        job_details = database.export_job_details(database.get_scan_job(job_id))
+        job_id = await async_database.submit_scan_job(scan_submission)
+        job_details = database.export_job_details(
+            await async_database.get_scan_job(job_id)
+        )
+        job_details["estimatedStartTime"] = queue_status["estimatedStartTime"]
         if app.debug:
             print(f"Scan Job Submitted: {job_id}", file=sys.stderr)
         return job_details, 201
 
 
-class AlanineScanJob(Resource):
+class AlanineScanJob(MethodView):
     """RESTful API endpoint for information on specific scan jobs."""
 
-    def get(self, job_id):
+    async def get(self, job_id):
         """Returns the status or results of an alanine scan job.
 
         Notes
         -----
-        A query string in the URI is used to determine if the status or results
-        should be returned.
+        A query string in the URI is used to determine if the status, results
+        or full log of the job should be returned.
         """
-        job = database.get_scan_job(job_id)
-        if job is None:
-            flask.abort(404)
         if "get-status" in request.args:
+            job = await async_database.get_scan_job(
+                job_id, database.JOB_DETAILS_PROJECTION
+            )
+            if job is None:
+                abort(404)
             if app.debug:
                 print(f"Getting Scan Job {job_id}...", file=sys.stderr)
             job_details = database.export_job_details(job)
             if job_details is None:
-                flask.abort(404)
+                abort(404)
             if app.debug:
                 print(f"Got job details for job {job_id}.", file=sys.stderr)
             return job_details, 200
         elif "get-results" in request.args:
             if app.debug:
                 print(f"Getting Scan Job results {job_id}...", file=sys.stderr)
-            exportable_job = database.export_job(job)
-            if exportable_job is None:
-                flask.abort(404)
-            elif exportable_job["status"] != database.JobStatus.COMPLETED.value:
-                flask.abort(404)
+            response = await results_response(job_id, async_database.get_scan_job)
             if app.debug:
                 print(f"Got job results for job {job_id}.", file=sys.stderr)
-            return exportable_job, 200
+            return response
+        elif "get-log" in request.args:
+            return await log_response(job_id, async_database.get_scan_job)
         return "No arguments supplied.", 400
 
+    async def delete(self, job_id):
+        """Cancels the job if it has not finished."""
+        return await cancel_response("scan", job_id)
+
 
-class AutoConstellationJobs(Resource):
+class AutoConstellationJobs(MethodView):
     """RESTful API endpoint for posting auto jobs and getting aggregate data."""
 
-    def post(self):
+    async def post(self):
         """Creates a new auto job on the server.
 
         Returns
         -------
         job_details : Dict
-            Dict containing the ID of the job, time submitted and the
-            current job status.
+            Dict containing the ID of the job, time submitted, the
+            current job status and the estimated start time. If the
+            queue is full, a 429 response is returned instead, see
+            `bals.admission`.
         """
-        auto_submission = request.json
+        auto_submission = await request.get_json()
+        error_response = await run_preflight("auto", auto_submission)
+        if error_response is not None:
+            return error_response
+        auto_submission["submitter"] = submitter_id()
+        queue_status, error_response = await admit("auto")
+        if error_response is not None:
+            return error_response
         if app.debug:
             print("Submitting auto constellation scan job...", file=sys.stderr)
-        job_id = database.submit_auto_job(auto_submission)
-        job_details = database.export_job_details(database.get_auto_job(job_id))
+        job_id = await async_database.submit_auto_job(auto_submission)
+        job_details = database.export_job_details(
+            await async_database.get_auto_job(job_id)
+        )
+        job_details["estimatedStartTime"] = queue_status["estimatedStartTime"]
         if app.debug:
             print(f"Auto constellation job submitted: {job_id}", file=sys.stderr)
         return job_details, 201
 
 
-class AutoConstellationJob(Resource):
+class AutoConstellationJob(MethodView):
     """RESTful API endpoint for information on specific auto jobs."""
 
-    def get(self, job_id):
+    async def get(self, job_id):
         """Returns the status or results of an auto job.
 
         Notes
         -----
-        A query string in the URI is used to determine if the status or results
-        should be returned.
+        A query string in the URI is used to determine if the status, results
+        or full log of the job should be returned.
         """
-        job = database.get_auto_job(job_id)
-        if job is None:
-            flask.abort(404)
         if "get-status" in request.args:
+            job = await async_database.get_auto_job(
+                job_id, database.JOB_DETAILS_PROJECTION
+            )
+            if job is None:
+                abort(404)
             if app.debug:
                 print(
                     f"Getting auto constellation job status{job_id}...", file=sys.stderr
                 )
             job_details = database.export_job_details(job)
             if job_details is None:
-                flask.abort(404)
+                abort(404)
             if app.debug:
                 print(f"Got job details for job {job_id}.", file=sys.stderr)
             return job_details, 200
@@ -142,54 +426,70 @@ class AutoConstellationJob(Resource):
                     f"Getting auto constellation job results {job_id}...",
                     file=sys.stderr,
                 )
-            exportable_job = database.export_job(job)
-            if exportable_job is None:
-                flask.abort(404)
-            elif exportable_job["status"] != database.JobStatus.COMPLETED.value:
-                flask.abort(404)
+            response = await results_response(job_id, async_database.get_auto_job)
             if app.debug:
                 print(f"Got job results for job {job_id}.", file=sys.stderr)
-            return exportable_job, 200
+            return response
+        elif "get-log" in request.args:
+            return await log_response(job_id, async_database.get_auto_job)
         return "No arguments supplied.", 400
 
+    async def delete(self, job_id):
+        """Cancels the job if it has not finished."""
+        return await cancel_response("auto", job_id)
+
 
-class ManualConstellationJobs(Resource):
+class ManualConstellationJobs(MethodView):
     """RESTful API endpoint for posting manual jobs and getting aggregate data."""
 
-    def post(self):
+    async def post(self):
         """Creates a new manual job on the server.
 
         Returns
         -------
         job_details : Dict
-            Dict containing the ID of the job, time submitted and the
-            current job status.
+            Dict containing the ID of the job, time submitted, the
+            current job status and the estimated start time. If the
+            queue is full, a 429 response is returned instead, see
+            `bals.admission`.
         """
-        manual_submission = request.json
+        manual_submission = await request.get_json()
+        error_response = await run_preflight("manual", manual_submission)
+        if error_response is not None:
+            return error_response
+        manual_submission["submitter"] = submitter_id()
+        queue_status, error_response = await admit("manual")
+        if error_response is not None:
+            return error_response
         if app.debug:
             print("Submitting manual constellation scan job...", file=sys.stderr)
-        job_id = database.submit_manual_job(manual_submission)
-        job_details = database.export_job_details(database.get_manual_job(job_id))
+        job_id = await async_database.submit_manual_job(manual_submission)
+        job_details = database.export_job_details(
+            await async_database.get_manual_job(job_id)
+        )
+        job_details["estimatedStartTime"] = queue_status["estimatedStartTime"]
         if app.debug:
             print(f"Manual constellation job submitted: {job_id}", file=sys.stderr)
         return job_details, 201
 
 
-class ManualConstellationJob(Resource):
+class ManualConstellationJob(MethodView):
     """RESTful API endpoint for information on specific manual jobs."""
 
-    def get(self, job_id):
+    async def get(self, job_id):
         """Returns the status or results of an manual job.
 
         Notes
         -----
-        A query string in the URI is used to determine if the status or results
-        should be returned.
+        A query string in the URI is used to determine if the status, results
+        or full log of the job should be returned.
         """
-        job = database.get_manual_job(job_id)
-        if job is None:
-            flask.abort(404)
         if "get-status" in request.args:
+            job = await async_database.get_manual_job(
+                job_id, database.JOB_DETAILS_PROJECTION
+            )
+            if job is None:
+                abort(404)
             if app.debug:
                 print(
                     f"Getting manual constellation job status{job_id}...",
@@ -197,7 +497,7 @@ class ManualConstellationJob(Resource):
                 )
             job_details = database.export_job_details(job)
             if job_details is None:
-                flask.abort(404)
+                abort(404)
             if app.debug:
                 print(f"Got job details for job {job_id}.", file=sys.stderr)
             return job_details, 200
@@ -207,54 +507,70 @@ class ManualConstellationJob(Resource):
                     f"Getting manual constellation job results {job_id}...",
                     file=sys.stderr,
                 )
-            exportable_job = database.export_job(job)
-            if exportable_job is None:
-                flask.abort(404)
-            elif exportable_job["status"] != database.JobStatus.COMPLETED.value:
-                flask.abort(404)
+            response = await results_response(job_id, async_database.get_manual_job)
             if app.debug:
                 print(f"Got job results for job {job_id}.", file=sys.stderr)
-            return exportable_job, 200
+            return response
+        elif "get-log" in request.args:
+            return await log_response(job_id, async_database.get_manual_job)
         return "No arguments supplied.", 400
 
+    async def delete(self, job_id):
+        """Cancels the job if it has not finished."""
+        return await cancel_response("manual", job_id)
+
 
-class ResiduesConstellationJobs(Resource):
+class ResiduesConstellationJobs(MethodView):
     """RESTful API endpoint for posting residues jobs and getting aggregate data."""
 
-    def post(self):
+    async def post(self):
         """Creates a new residues job on the server.
 
         Returns
         -------
         job_details : Dict
-            Dict containing the ID of the job, time submitted and the
-            current job status.
+            Dict containing the ID of the job, time submitted, the
+            current job status and the estimated start time. If the
+            queue is full, a 429 response is returned instead, see
+            `bals.admission`.
         """
-        residues_submission = request.json
+        residues_submission = await request.get_json()
+        error_response = await run_preflight("residues", residues_submission)
+        if error_response is not None:
+            return error_response
+        residues_submission["submitter"] = submitter_id()
+        queue_status, error_response = await admit("residues")
+        if error_response is not None:
+            return error_response
         if app.debug:
             print("Submitting residues constellation scan job...", file=sys.stderr)
-        job_id = database.submit_residues_job(residues_submission)
-        job_details = database.export_job_details(database.get_residues_job(job_id))
+        job_id = await async_database.submit_residues_job(residues_submission)
+        job_details = database.export_job_details(
+            await async_database.get_residues_job(job_id)
+        )
+        job_details["estimatedStartTime"] = queue_status["estimatedStartTime"]
         if app.debug:
             print(f"Residues constellation job submitted: {job_id}", file=sys.stderr)
         return job_details, 201
 
 
-class ResiduesConstellationJob(Resource):
+class ResiduesConstellationJob(MethodView):
     """RESTful API endpoint for information on specific residues jobs."""
 
-    def get(self, job_id):
+    async def get(self, job_id):
         """Returns the status or results of an residues job.
 
         Notes
         -----
-        A query string in the URI is used to determine if the status or results
-        should be returned.
+        A query string in the URI is used to determine if the status, results
+        or full log of the job should be returned.
         """
-        job = database.get_residues_job(job_id)
-        if job is None:
-            flask.abort(404)
         if "get-status" in request.args:
+            job = await async_database.get_residues_job(
+                job_id, database.JOB_DETAILS_PROJECTION
+            )
+            if job is None:
+                abort(404)
             if app.debug:
                 print(
                     f"Getting residues constellation job status{job_id}...",
@@ -262,7 +578,7 @@ class ResiduesConstellationJob(Resource):
                 )
             job_details = database.export_job_details(job)
             if job_details is None:
-                flask.abort(404)
+                abort(404)
             if app.debug:
                 print(f"Got job details for job {job_id}.", file=sys.stderr)
             return job_details, 200
@@ -272,22 +588,232 @@ class ResiduesConstellationJob(Resource):
                     f"Getting residues constellation job results {job_id}...",
                     file=sys.stderr,
                 )
-            exportable_job = database.export_job(job)
-            if exportable_job is None:
-                flask.abort(404)
-            elif exportable_job["status"] != database.JobStatus.COMPLETED.value:
-                flask.abort(404)
+            response = await results_response(job_id, async_database.get_residues_job)
             if app.debug:
                 print(f"Got job results for job {job_id}.", file=sys.stderr)
-            return exportable_job, 200
+            return response
+        elif "get-log" in request.args:
+            return await log_response(job_id, async_database.get_residues_job)
         return "No arguments supplied.", 400
 
+    async def delete(self, job_id):
+        """Cancels the job if it has not finished."""
+        return await cancel_response("residues", job_id)
+
+
+async def run_preflight(job_type, submission):
+    """Checks a job submission and records its estimated cost.
+
+    Notes
+    -----
+    Reading the PDB file can take tens of milliseconds for large
+    ensembles, so the checks are run in a thread rather than blocking
+    the event loop.
+
+    Returns
+    -------
+    error_response : tuple or None
+        A 400 response if the job would fail, otherwise `None`.
+    """
+    try:
+        submission["estimatedCost"] = await asyncio.to_thread(
+            preflight.check_submission,
+            job_type,
+            submission,
+            app.config["PREFLIGHT_MAX_COST"],
+        )
+    except preflight.PreflightError as error:
+        return {"message": str(error)}, 400
+    return None
+
+
+def submitter_id():
+    """Identifies the submitter of a request, for fair-share scheduling.
+
+    Notes
+    -----
+    The submitter is the client's address, as added to `X-Forwarded-For`
+    by nginx. Earlier entries in the header are set by the client, so they
+    are not used. The address is hashed with an HMAC keyed by
+    `SUBMITTER_SECRET`, so that it is neither stored nor shown and cannot
+    be recovered by hashing every possible address.
+    """
+    forwarded_for = request.headers.get("X-Forwarded-For", "")
+    address = forwarded_for.split(",")[-1].strip() or request.remote_addr or ""
+    return hmac.new(
+        app.config["SUBMITTER_SECRET"].encode(), address.encode(), hashlib.sha256
+    ).hexdigest()[:16]
+
+
+def submitter_totals(stats):
+    """Combines the statistics of every submitter, without their IDs."""
+    started = sum(entry["started"] for entry in stats)
+    totals = {
+        "submitters": len(stats),
+        "waiting": sum(entry["waiting"] for entry in stats),
+        "running": sum(entry["running"] for entry in stats),
+        "started": started,
+        "maxWaitSeconds": max(
+            (entry["maxWaitSeconds"] for entry in stats), default=0.0
+        ),
+    }
+    if started:
+        total_wait = sum(
+            entry["meanWaitSeconds"] * entry["started"]
+            for entry in stats
+            if entry["started"]
+        )
+        totals["meanWaitSeconds"] = round(total_wait / started, 1)
+    return totals
+
+
+async def admit(job_type, job_count=1):
+    """Checks that the queue of a job type can take more jobs.
+
+    Returns
+    -------
+    status : dict
+        Status of the queue, see `admission.queue_status`.
+    error_response : tuple or None
+        A 429 response if the jobs are rejected, otherwise `None`.
+    """
+    status = admission.queue_status(
+        await async_database.get_queue_stats(job_type),
+        app.config["ADMISSION_DEFAULT_JOB_SECONDS"],
+        await async_database.get_job_workers(job_type),
+    )
+    try:
+        admission.check_admission(
+            status,
+            job_count,
+            app.config["ADMISSION_MAX_QUEUED"],
+            app.config["ADMISSION_MAX_WAIT_SECONDS"],
+        )
+    except admission.QueueFull as error:
+        return status, (
+            {"message": str(error), "retryAfter": error.retry_after},
+            429,
+            {"Retry-After": str(error.retry_after)},
+        )
+    return status, None
+
+
+class Batches(MethodView):
+    """RESTful API endpoint for submitting many jobs at once."""
+
+    async def post(self):
+        """Creates a batch of jobs on the server.
+
+        Notes
+        -----
+        See `bals.batches` for the format of the request. All the jobs are
+        inserted with a single database write.
+
+        Returns
+        -------
+        batch_details : Dict
+            Dict containing the ID of the batch, the IDs of the jobs
+            in submission order and the number of jobs in each state.
+        """
+        batch_request = await request.get_json()
+        try:
+            job_type, submissions = batches.make_submissions(batch_request)
+        except batches.BatchError as error:
+            return {"message": str(error)}, 400
+        try:
+            # All the jobs are checked in one thread, see `run_preflight`
+            estimated_costs = await asyncio.to_thread(
+                preflight.check_batch,
+                job_type,
+                submissions,
+                app.config["PREFLIGHT_MAX_COST"],
+            )
+        except preflight.PreflightError as error:
+            return {"message": str(error)}, 400
+        for submission, estimated_cost in zip(submissions, estimated_costs):
+            submission["estimatedCost"] = estimated_cost
+            submission["submitter"] = submitter_id()
+        queue_status, error_response = await admit(job_type, len(submissions))
+        if error_response is not None:
+            return error_response
+        if app.debug:
+            print(f"Submitting batch of {len(submissions)} jobs...", file=sys.stderr)
+        batch_id, job_ids = await async_database.submit_batch(
+            job_type, submissions, batch_request.get("name", "")
+        )
+        batch_details = database.export_batch(await async_database.get_batch(batch_id))
+        batch_details["jobIds"] = [str(job_id) for job_id in job_ids]
+        batch_details["estimatedStartTime"] = queue_status["estimatedStartTime"]
+        if app.debug:
+            print(f"Batch submitted: {batch_id}", file=sys.stderr)
+        return batch_details, 201
+
+
+class Batch(MethodView):
+    """RESTful API endpoint for the progress of a batch of jobs."""
 
-API.add_resource(AlanineScanJobs, "/api/v0.1/alanine-scan-jobs")
-API.add_resource(AlanineScanJob, "/api/v0.1/alanine-scan-job/<string:job_id>")
-API.add_resource(AutoConstellationJobs, "/api/v0.1/auto-jobs")
-API.add_resource(AutoConstellationJob, "/api/v0.1/auto-job/<string:job_id>")
-API.add_resource(ManualConstellationJobs, "/api/v0.1/manual-jobs")
-API.add_resource(ManualConstellationJob, "/api/v0.1/manual-job/<string:job_id>")
-API.add_resource(ResiduesConstellationJobs, "/api/v0.1/residues-jobs")
-API.add_resource(ResiduesConstellationJob, "/api/v0.1/residues-job/<string:job_id>")
+    async def get(self, batch_id):
+        """Returns the progress of a batch of jobs.
+
+        Notes
+        -----
+        The number of jobs in each state is always returned, adding
+        `get-jobs` to the query string also returns the status details
+        of every job in the batch.
+        """
+        batch = await async_database.get_batch(batch_id)
+        if batch is None:
+            abort(404)
+        if "get-jobs" in request.args:
+            jobs = await async_database.get_batch_jobs(batch)
+        else:
+            jobs = None
+        return database.export_batch(batch, jobs), 200
+
+
+app.add_url_rule(
+    "/api/v0.1/alanine-scan-jobs",
+    view_func=AlanineScanJobs.as_view("alanine_scan_jobs"),
+)
+app.add_url_rule(
+    "/api/v0.1/alanine-scan-job/<string:job_id>",
+    view_func=AlanineScanJob.as_view("alanine_scan_job"),
+)
+app.add_url_rule(
+    "/api/v0.1/auto-jobs", view_func=AutoConstellationJobs.as_view("auto_jobs")
+)
+app.add_url_rule(
+    "/api/v0.1/auto-job/<string:job_id>",
+    view_func=AutoConstellationJob.as_view("auto_job"),
+)
+app.add_url_rule(
+    "/api/v0.1/manual-jobs", view_func=ManualConstellationJobs.as_view("manual_jobs")
+)
+app.add_url_rule(
+    "/api/v0.1/manual-job/<string:job_id>",
+    view_func=ManualConstellationJob.as_view("manual_job"),
+)
+app.add_url_rule(
+    "/api/v0.1/residues-jobs",
+    view_func=ResiduesConstellationJobs.as_view("residues_jobs"),
+)
+app.add_url_rule(
+    "/api/v0.1/residues-job/<string:job_id>",
+    view_func=ResiduesConstellationJob.as_view("residues_job"),
+)
+app.add_url_rule("/api/v0.1/batches", view_func=Batches.as_view("batches"))
+app.add_url_rule("/api/v0.1/batch/<string:batch_id>", view_func=Batch.as_view("batch"))
+app.add_url_rule(
+    "/api/v0.1/queue-status", view_func=QueueStatus.as_view("queue_status")
+)
+app.add_url_rule(
+    "/api/v0.1/submitter-stats", view_func=SubmitterStats.as_view("submitter_stats")
+)
+app.add_url_rule(
+    "/api/v0.1/result-files-usage",
+    view_func=ResultFilesUsage.as_view("result_files_usage"),
+)
+app.add_url_rule(
+    "/balas-result-files/<string:file_name>",
+    view_func=ResultFile.as_view("result_file"),
+)
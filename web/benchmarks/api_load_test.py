@@ -0,0 +1,188 @@
+"""Load test for comparing two deployments of the BALS REST API.
+
+Notes
+-----
+The test replays the traffic pattern of the Elm front end: a small number
+of job submissions and a large number of status polls, plus result fetches
+for completed jobs. Each target is hit with the same request mix and the
+throughput and latency percentiles are reported side by side.
+
+Both deployments should point at a disposable local MongoDB rather than the
+production database, for example::
+
+    docker run -d --rm -p 27017:27017 --name balas-load-db mongo
+
+To compare the uWSGI deployment with the ASGI one, check out and start each
+on a different port against the same database, then run::
+
+    python api_load_test.py http://localhost:3803 http://localhost:3804 \\
+        --mongo-host localhost --requests 5000 --concurrency 64
+
+If `--mongo-host` is given, `pymongo` is used to mark the seeded jobs as
+completed so that `get-results` requests can be included in the mix.
+Otherwise only submissions and status polls are sent.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import pathlib
+import random
+import statistics
+import time
+import urllib.error
+import urllib.request
+
+TEST_PDB = pathlib.Path(__file__).parents[1] / "tests_data" / "1ycr.pdb"
+
+
+def main():
+    """Runs the load test against each target and prints a summary."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("targets", nargs="+", help="Base URLs of the deployments.")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--seed-jobs", type=int, default=20, help="Jobs submitted before timing."
+    )
+    parser.add_argument(
+        "--results-fraction",
+        type=float,
+        default=0.1,
+        help="Fraction of requests that fetch results rather than status.",
+    )
+    parser.add_argument(
+        "--mongo-host",
+        default=None,
+        help="Host of the local MongoDB used by the targets.",
+    )
+    args = parser.parse_args()
+    pdb_string = TEST_PDB.read_text()
+    summaries = []
+    for target in args.targets:
+        target = target.rstrip("/")
+        job_ids = seed_jobs(target, pdb_string, args.seed_jobs)
+        if args.mongo_host:
+            mark_jobs_completed(args.mongo_host, job_ids)
+            results_fraction = args.results_fraction
+        else:
+            results_fraction = 0.0
+        urls = make_request_urls(target, job_ids, args.requests, results_fraction)
+        summaries.append((target, run_load(urls, args.concurrency)))
+    print_summaries(summaries)
+    return
+
+
+def seed_jobs(target, pdb_string, number_of_jobs):
+    """Submits scan jobs through the API and returns their IDs."""
+    job_ids = []
+    for i in range(number_of_jobs):
+        submission = {
+            "name": f"load-test-{i}",
+            "pdbFile": pdb_string,
+            "receptor": ["A"],
+            "ligand": ["B"],
+            "rotamerFixActive": False,
+        }
+        request = urllib.request.Request(
+            f"{target}/api/v0.1/alanine-scan-jobs",
+            data=json.dumps(submission).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        with urllib.request.urlopen(request) as response:
+            job_ids.append(json.load(response)["_id"])
+    return job_ids
+
+
+def mark_jobs_completed(mongo_host, job_ids):
+    """Gives the seeded jobs a completed status and dummy results."""
+    import pymongo
+    from bson.objectid import ObjectId
+
+    client = pymongo.MongoClient(mongo_host, 27017)
+    client.bals.alanine_scan_jobs.update_many(
+        {"_id": {"$in": [ObjectId(job_id) for job_id in job_ids]}},
+        {
+            "$set": {
+                "status": 4,
+                "dG": -50.0,
+                "receptorData": [],
+                "ligandData": [],
+                "std_out": "",
+            }
+        },
+    )
+    client.close()
+    return
+
+
+def make_request_urls(target, job_ids, number_of_requests, results_fraction):
+    """Creates a reproducible list of status and result request URLs."""
+    rng = random.Random(0)
+    urls = []
+    for _ in range(number_of_requests):
+        job_id = rng.choice(job_ids)
+        query = "get-results" if rng.random() < results_fraction else "get-status"
+        urls.append(f"{target}/api/v0.1/alanine-scan-job/{job_id}?{query}")
+    return urls
+
+
+def timed_get(url):
+    """Performs a GET request and returns the latency and status code."""
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as error:
+        status = error.code
+    except urllib.error.URLError:
+        status = None
+    return time.perf_counter() - start, status
+
+
+def run_load(urls, concurrency):
+    """Sends all the requests using a pool of client threads."""
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        timings = list(executor.map(timed_get, urls))
+    wall_time = time.perf_counter() - start
+    latencies = sorted(latency for (latency, _) in timings)
+    errors = sum(1 for (_, status) in timings if status is None or status >= 500)
+    return {
+        "requests": len(urls),
+        "errors": errors,
+        "throughput": len(urls) / wall_time,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "mean": statistics.mean(latencies),
+    }
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list."""
+    rank = max(0, int(round(percent / 100 * len(sorted_values))) - 1)
+    return sorted_values[rank]
+
+
+def print_summaries(summaries):
+    """Prints a table comparing each target against the first."""
+    header = (
+        f"{'target':40} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10} "
+        f"{'errors':>8} {'speed-up':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    baseline = summaries[0][1]["throughput"]
+    for target, summary in summaries:
+        print(
+            f"{target:40} {summary['throughput']:10.1f} "
+            f"{summary['p50'] * 1000:10.2f} {summary['p99'] * 1000:10.2f} "
+            f"{summary['errors']:8d} {summary['throughput'] / baseline:8.2f}x"
+        )
+    return
+
+
+if __name__ == "__main__":
+    main()
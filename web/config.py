@@ -1,10 +1,10 @@
-"""This module contains configuration options for Flask."""
+"""This module contains configuration options for the Quart app."""
 
 import os
 
 
 def get_config():
-    """Create the config object for the Flask app.
+    """Create the config object for the Quart app.
 
     Notes
     -----
@@ -31,9 +31,41 @@ def get_config():
 
 
 class BaseConfig:
-    """Contains shared configuration options."""
+    """Contains shared configuration options.
 
-    pass
+    Notes
+    -----
+    The database connection pool is per worker process, so the total number
+    of connections to MongoDB is `DB_MAX_POOL_SIZE` times the number of
+    Hypercorn workers.
+    """
+
+    DB_MAX_POOL_SIZE = int(os.getenv(key="BALAS_DB_MAX_POOL_SIZE", default="20"))
+    DB_MIN_POOL_SIZE = int(os.getenv(key="BALAS_DB_MIN_POOL_SIZE", default="2"))
+    # This is hard coded as it needs to be included in the nginx.conf file
+    RESULT_FILES_DIR = "/balas-result-files"
+    # Internal nginx location that serves `RESULT_FILES_DIR`, if `None` the
+    # app sends the files itself
+    RESULT_FILES_INTERNAL_URI = "/internal-result-files"
+    # Jobs with a larger estimated cost are rejected, see `bals.preflight`
+    PREFLIGHT_MAX_COST = float(os.getenv(key="BALAS_PREFLIGHT_MAX_COST", default="inf"))
+    # Submissions are rejected when a queue is this long or its estimated
+    # wait is this long, see `bals.admission`
+    ADMISSION_MAX_QUEUED = float(os.getenv(key="BALAS_MAX_QUEUED", default="inf"))
+    ADMISSION_MAX_WAIT_SECONDS = float(
+        os.getenv(key="BALAS_MAX_WAIT_SECONDS", default="inf")
+    )
+    # Run time assumed for a job before any have completed
+    ADMISSION_DEFAULT_JOB_SECONDS = float(
+        os.getenv(key="BALAS_DEFAULT_JOB_SECONDS", default="600")
+    )
+    # Key of the HMAC used to identify submitters by their address, it
+    # must be set and be the same for every worker
+    SUBMITTER_SECRET = os.getenv(key="BALAS_SUBMITTER_SECRET", default="")
+    # Period covered by the queue wait statistics of each submitter
+    SUBMITTER_STATS_HOURS = float(
+        os.getenv(key="BALAS_SUBMITTER_STATS_HOURS", default="24")
+    )
 
 
 class DevelopmentConfig(BaseConfig):
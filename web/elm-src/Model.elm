@@ -3,6 +3,7 @@ module Model exposing
     , AlanineScanResults
     , AlanineScanSub
     , AppMode(..)
+    , ArchiveState(..)
     , AutoSettings
     , ChainID
     , ConstellationMode(..)
@@ -671,28 +672,81 @@ type alias JobDetails =
     , name : String
     , status : JobStatus
     , stdOut : Maybe String
+    , archive : ArchiveState
     }
 
 
 encodeJobDetails : JobDetails -> JEn.Value
-encodeJobDetails { jobID, name, status, stdOut } =
+encodeJobDetails { jobID, name, status, stdOut, archive } =
     JEn.object
-        [ ( "_id", JEn.string jobID )
-        , ( "name", JEn.string name )
-        , ( "status", jobStatusToInt status |> JEn.int )
-        , ( "stdOut", JEnEx.maybe JEn.string stdOut )
-        ]
+        ([ ( "_id", JEn.string jobID )
+         , ( "name", JEn.string name )
+         , ( "status", jobStatusToInt status |> JEn.int )
+         , ( "stdOut", JEnEx.maybe JEn.string stdOut )
+         ]
+            ++ encodeArchiveState archive
+        )
 
 
 {-| Decodes JSON produced by the server into `JobDetails`.
 -}
 jobDetailsDecoder : JDe.Decoder JobDetails
 jobDetailsDecoder =
-    JDe.map4 JobDetails
+    JDe.map5 JobDetails
         (JDe.field "_id" JDe.string)
         (JDe.field "name" JDe.string)
         (JDe.field "status" (JDe.int |> JDe.andThen intToJobStatus))
         (JDe.maybe (JDe.field "std_out" JDe.string))
+        archiveStateDecoder
+
+
+{-| Represents the archive of the full output of a job. The archive is built
+after the job has completed, the server returns its file name once it is
+ready. Archives that have not been downloaded for a long time are removed
+from the server.
+-}
+type ArchiveState
+    = ArchivePending
+    | ArchiveReady String
+    | ArchiveEvicted
+
+
+encodeArchiveState : ArchiveState -> List ( String, JEn.Value )
+encodeArchiveState archive =
+    case archive of
+        ArchivePending ->
+            [ ( "archiveReady", JEn.bool False ) ]
+
+        ArchiveReady archiveFile ->
+            [ ( "archiveReady", JEn.bool True )
+            , ( "archiveFile", JEn.string archiveFile )
+            ]
+
+        ArchiveEvicted ->
+            [ ( "archiveEvicted", JEn.bool True ) ]
+
+
+{-| Decodes the `archiveReady`, `archiveFile` and `archiveEvicted` fields of
+the job details. Jobs from before the archives were built after the job
+completed have none of these fields and their archive is named after the job.
+-}
+archiveStateDecoder : JDe.Decoder ArchiveState
+archiveStateDecoder =
+    JDe.map4
+        (\jobID archiveReady archiveFile archiveEvicted ->
+            if archiveEvicted == Just True then
+                ArchiveEvicted
+
+            else if archiveReady == Just False then
+                ArchivePending
+
+            else
+                ArchiveReady <| Maybe.withDefault (jobID ++ ".zip") archiveFile
+        )
+        (JDe.field "_id" JDe.string)
+        (JDe.maybe (JDe.field "archiveReady" JDe.bool))
+        (JDe.maybe (JDe.field "archiveFile" JDe.string))
+        (JDe.maybe (JDe.field "archiveEvicted" JDe.bool))
 
 
 {-| Represents the possible status that any job on the server could have. This
@@ -704,6 +758,7 @@ type JobStatus
     | Running
     | Completed
     | Failed
+    | Cancelled
 
 
 statusToString : JobStatus -> String
@@ -724,6 +779,9 @@ statusToString jobStatus =
         Failed ->
             "Failed: Check notification for details."
 
+        Cancelled ->
+            "Cancelled"
+
 
 stringToStatus : String -> JobStatus
 stringToStatus statusString =
@@ -743,6 +801,9 @@ stringToStatus statusString =
         "Failed" ->
             Failed
 
+        "Cancelled" ->
+            Cancelled
+
         _ ->
             Submitted
 
@@ -769,6 +830,9 @@ intToJobStatus statusNumber =
         5 ->
             JDe.succeed Failed
 
+        6 ->
+            JDe.succeed Cancelled
+
         _ ->
             JDe.fail "Unknown status."
 
@@ -791,12 +855,18 @@ jobStatusToInt status =
         Failed ->
             5
 
+        Cancelled ->
+            6
+
 
 {-| Filters a list of `JobDetails` for jobs that are submitted, queued or
-running.
+running, or that have completed but their archive is still being built.
 -}
 getActiveJobs : List JobDetails -> List JobDetails
 getActiveJobs jobs =
     List.filter
-        (\{ status } -> (status /= Completed) && (status /= Failed))
+        (\{ status, archive } ->
+            ((status /= Completed) && (status /= Failed) && (status /= Cancelled))
+                || ((status == Completed) && (archive == ArchivePending))
+        )
         jobs
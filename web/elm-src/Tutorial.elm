@@ -386,6 +386,7 @@ theJobsPanel { previous, next, cancel } =
                             "1ycr AB Scan"
                             Model.Completed
                             Nothing
+                            (Model.ArchiveReady "5bb1eca7559d620012f74c31.zip")
                         ]
                 }
         }
@@ -409,9 +410,11 @@ There are some other options too:
 
 * *Copy Results Link to Clipboard* - This copies a link to the results of your
 job to your clipboard. You can share this link with anyone.
-* *Download Full Output* - Downloads a zip file containing the full output
-produced by the commandline application. This even includes Chimera scripts for
-displaying the results of the job.
+* *Download Full Output* - Downloads an archive containing the full output
+produced by the commandline application. For jobs run with rotamer correction
+this even includes Chimera scripts for displaying the results of the job. The
+archive is prepared shortly after the job completes, and is removed if it is
+not downloaded for a long time.
 * *Delete* - Deletes a job from your jobs list, but not on the server, so anyone
 with a link can still see the output.
 """
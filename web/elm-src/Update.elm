@@ -615,35 +615,39 @@ updateScan scanMsg scanModel =
                         |> List.map Tuple.second
               }
             , Cmd.none
-            , case jobDetails.status of
-                Model.Completed ->
-                    [ Notification
-                        ""
-                        "Alanine Scan Completed"
-                        ("Alanine scan job "
-                            ++ jobDetails.name
-                            ++ " ("
-                            ++ jobDetails.jobID
-                            ++ ") complete. Retrieve the results from"
-                            ++ " the 'Jobs' tab."
-                        )
-                    ]
-
-                Model.Failed ->
-                    [ Notification
-                        ""
-                        ("Alanine Scan \"" ++ jobDetails.name ++ "\" Failed")
-                        ("Job ID: "
-                            ++ jobDetails.jobID
-                            ++ "\n"
-                            ++ Maybe.withDefault
-                                "Unknown error."
-                                jobDetails.stdOut
-                        )
-                    ]
+            , if statusChanged scanModel.jobs jobDetails then
+                case jobDetails.status of
+                    Model.Completed ->
+                        [ Notification
+                            ""
+                            "Alanine Scan Completed"
+                            ("Alanine scan job "
+                                ++ jobDetails.name
+                                ++ " ("
+                                ++ jobDetails.jobID
+                                ++ ") complete. Retrieve the results from"
+                                ++ " the 'Jobs' tab."
+                            )
+                        ]
 
-                _ ->
-                    []
+                    Model.Failed ->
+                        [ Notification
+                            ""
+                            ("Alanine Scan \"" ++ jobDetails.name ++ "\" Failed")
+                            ("Job ID: "
+                                ++ jobDetails.jobID
+                                ++ "\n"
+                                ++ Maybe.withDefault
+                                    "Unknown error."
+                                    jobDetails.stdOut
+                            )
+                        ]
+
+                    _ ->
+                        []
+
+              else
+                []
             )
 
         ProcessScanStatus (Err error) ->
@@ -906,35 +910,39 @@ updateConstellation msg model =
                         |> List.map Tuple.second
               }
             , Cmd.none
-            , case jobDetails.status of
-                Model.Completed ->
-                    [ Notification
-                        ""
-                        "Auto Constellation Scan Completed"
-                        ("Auto constellation scan job "
-                            ++ jobDetails.name
-                            ++ " ("
-                            ++ jobDetails.jobID
-                            ++ " complete. Retrieve the results from"
-                            ++ " the 'Jobs' tab."
-                        )
-                    ]
-
-                Model.Failed ->
-                    [ Notification
-                        ""
-                        ("Auto Constellation Scan \"" ++ jobDetails.name ++ "\" Failed")
-                        ("Job ID: "
-                            ++ jobDetails.jobID
-                            ++ "\n"
-                            ++ Maybe.withDefault
-                                "Unknown error."
-                                jobDetails.stdOut
-                        )
-                    ]
+            , if statusChanged model.autoJobs jobDetails then
+                case jobDetails.status of
+                    Model.Completed ->
+                        [ Notification
+                            ""
+                            "Auto Constellation Scan Completed"
+                            ("Auto constellation scan job "
+                                ++ jobDetails.name
+                                ++ " ("
+                                ++ jobDetails.jobID
+                                ++ " complete. Retrieve the results from"
+                                ++ " the 'Jobs' tab."
+                            )
+                        ]
 
-                _ ->
-                    []
+                    Model.Failed ->
+                        [ Notification
+                            ""
+                            ("Auto Constellation Scan \"" ++ jobDetails.name ++ "\" Failed")
+                            ("Job ID: "
+                                ++ jobDetails.jobID
+                                ++ "\n"
+                                ++ Maybe.withDefault
+                                    "Unknown error."
+                                    jobDetails.stdOut
+                            )
+                        ]
+
+                    _ ->
+                        []
+
+              else
+                []
             )
 
         ProcessAutoJobStatus (Err error) ->
@@ -1025,35 +1033,39 @@ updateConstellation msg model =
                         |> List.map Tuple.second
               }
             , Cmd.none
-            , case jobDetails.status of
-                Model.Completed ->
-                    [ Notification
-                        ""
-                        "Manual Constellation Scan Completed"
-                        ("Manual constellation scan job "
-                            ++ jobDetails.name
-                            ++ " ("
-                            ++ jobDetails.jobID
-                            ++ " complete. Retrieve the results from"
-                            ++ " the 'Jobs' tab."
-                        )
-                    ]
-
-                Model.Failed ->
-                    [ Notification
-                        ""
-                        ("Manual Constellation Scan \"" ++ jobDetails.name ++ "\" Failed")
-                        ("Job ID: "
-                            ++ jobDetails.jobID
-                            ++ "\n"
-                            ++ Maybe.withDefault
-                                "Unknown error."
-                                jobDetails.stdOut
-                        )
-                    ]
+            , if statusChanged model.manualJobs jobDetails then
+                case jobDetails.status of
+                    Model.Completed ->
+                        [ Notification
+                            ""
+                            "Manual Constellation Scan Completed"
+                            ("Manual constellation scan job "
+                                ++ jobDetails.name
+                                ++ " ("
+                                ++ jobDetails.jobID
+                                ++ " complete. Retrieve the results from"
+                                ++ " the 'Jobs' tab."
+                            )
+                        ]
 
-                _ ->
-                    []
+                    Model.Failed ->
+                        [ Notification
+                            ""
+                            ("Manual Constellation Scan \"" ++ jobDetails.name ++ "\" Failed")
+                            ("Job ID: "
+                                ++ jobDetails.jobID
+                                ++ "\n"
+                                ++ Maybe.withDefault
+                                    "Unknown error."
+                                    jobDetails.stdOut
+                            )
+                        ]
+
+                    _ ->
+                        []
+
+              else
+                []
             )
 
         ProcessManualJobStatus (Err error) ->
@@ -1144,35 +1156,39 @@ updateConstellation msg model =
                         |> List.map Tuple.second
               }
             , Cmd.none
-            , case jobDetails.status of
-                Model.Completed ->
-                    [ Notification
-                        ""
-                        "Residues Constellation Scan Completed"
-                        ("Residues constellation scan job "
-                            ++ jobDetails.name
-                            ++ " ("
-                            ++ jobDetails.jobID
-                            ++ " complete. Retrieve the results from"
-                            ++ " the 'Jobs' tab."
-                        )
-                    ]
-
-                Model.Failed ->
-                    [ Notification
-                        ""
-                        ("Residues Constellation Scan \"" ++ jobDetails.name ++ "\" Failed")
-                        ("Job ID: "
-                            ++ jobDetails.jobID
-                            ++ "\n"
-                            ++ Maybe.withDefault
-                                "Unknown error."
-                                jobDetails.stdOut
-                        )
-                    ]
+            , if statusChanged model.residuesJobs jobDetails then
+                case jobDetails.status of
+                    Model.Completed ->
+                        [ Notification
+                            ""
+                            "Residues Constellation Scan Completed"
+                            ("Residues constellation scan job "
+                                ++ jobDetails.name
+                                ++ " ("
+                                ++ jobDetails.jobID
+                                ++ " complete. Retrieve the results from"
+                                ++ " the 'Jobs' tab."
+                            )
+                        ]
 
-                _ ->
-                    []
+                    Model.Failed ->
+                        [ Notification
+                            ""
+                            ("Residues Constellation Scan \"" ++ jobDetails.name ++ "\" Failed")
+                            ("Job ID: "
+                                ++ jobDetails.jobID
+                                ++ "\n"
+                                ++ Maybe.withDefault
+                                    "Unknown error."
+                                    jobDetails.stdOut
+                            )
+                        ]
+
+                    _ ->
+                        []
+
+              else
+                []
             )
 
         ProcessResiduesJobStatus (Err error) ->
@@ -1538,3 +1554,14 @@ removeListItem idx editList =
     List.indexedMap (\a b -> ( a, b )) editList
         |> List.filter (\( refIdx, _ ) -> refIdx /= idx)
         |> List.map Tuple.second
+
+
+{-| Checks if the status of a job differs from its status in a list of jobs.
+Completed jobs are checked again until their archive is ready, so this is used
+to notify the user only once.
+-}
+statusChanged : List Model.JobDetails -> Model.JobDetails -> Bool
+statusChanged jobs jobDetails =
+    List.all
+        (\job -> job.jobID /= jobDetails.jobID || job.status /= jobDetails.status)
+        jobs
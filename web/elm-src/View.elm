@@ -785,6 +785,9 @@ activeConstellationSub model scanRes settings =
 
                             Model.Completed ->
                                 True
+
+                            Model.Cancelled ->
+                                True
                     )
 
         modeString =
@@ -1296,7 +1299,7 @@ jobTable tableTitle jobRoot jobs =
 
 
 jobTableRow : String -> Model.JobDetails -> Html Update.Msg
-jobTableRow jobRoot { jobID, name, status } =
+jobTableRow jobRoot { jobID, name, status, archive } =
     Fancy.tr
         [ css
             [ Css.fontSize (Css.pt 10)
@@ -1322,17 +1325,26 @@ jobTableRow jobRoot { jobID, name, status } =
                             [ text "Copy Results Link to Clipboard" ]
                         ]
                     , li []
-                        [ a
-                            [ href <|
-                                UrlB.absolute
-                                    [ "balas-result-files"
-                                    , jobID ++ ".zip"
+                        (case archive of
+                            Model.ArchiveReady archiveFile ->
+                                [ a
+                                    [ href <|
+                                        UrlB.absolute
+                                            [ "balas-result-files"
+                                            , archiveFile
+                                            ]
+                                            []
+                                    , download archiveFile
                                     ]
-                                    []
-                            , download <| jobID ++ ".zip"
-                            ]
-                            [ text "Download Full Output" ]
-                        ]
+                                    [ text "Download Full Output" ]
+                                ]
+
+                            Model.ArchivePending ->
+                                [ text "Preparing Full Output..." ]
+
+                            Model.ArchiveEvicted ->
+                                [ text "Full Output No Longer Available" ]
+                        )
                     ]
 
                   else
@@ -1,6 +1,6 @@
 """The main entry point for the BALS web app.
 
-This is used by uWSGI to start instances of the application.
+This is used by Hypercorn to start instances of the application.
 """
 import bals
 import config
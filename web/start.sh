@@ -0,0 +1,6 @@
+#!/usr/bin/env bash
+# Starts the ASGI server for the API and nginx in front of it.
+set -e
+rm -f /tmp/hypercorn.sock
+hypercorn --config /app/hypercorn.toml --workers "${WEB_WORKERS:-2}" main:app &
+exec nginx
@@ -0,0 +1,68 @@
+"""Tests the fingerprints of jobs from `bals.database`."""
+
+import os
+import pathlib
+
+os.environ.setdefault("BALAS_DB_NAME", "localhost")
+
+from bals import database  # noqa: E402
+
+TESTS_DATA = pathlib.Path(__file__).parent.parent / "tests_data"
+
+
+def make_submission():
+    """Creates a manual constellation submission for 1ycr."""
+    return {
+        "scanName": "1ycr",
+        "pdbFile": (TESTS_DATA / "1ycr.pdb").read_text(),
+        "receptor": ["A"],
+        "ligand": ["B"],
+        "residues": ["B19", "B23", "B26"],
+        "rotamerFixActive": True,
+    }
+
+
+def test_fingerprint_ignores_order():
+    submission = make_submission()
+    reordered = make_submission()
+    reordered["residues"] = ["B26", "B19", "B23"]
+    assert database.job_fingerprint("manual", submission) == database.job_fingerprint(
+        "manual", reordered
+    )
+
+
+def test_fingerprint_ignores_case():
+    submission = make_submission()
+    lower_case = make_submission()
+    lower_case["receptor"] = ["a"]
+    lower_case["ligand"] = ["b"]
+    lower_case["residues"] = ["b19", "b23", "b26"]
+    assert database.job_fingerprint("manual", submission) == database.job_fingerprint(
+        "manual", lower_case
+    )
+
+
+def test_fingerprint_ignores_pdb_whitespace():
+    submission = make_submission()
+    reformatted = make_submission()
+    reformatted["pdbFile"] = "\r\n".join(
+        line.rstrip() + "   " for line in submission["pdbFile"].splitlines()
+    )
+    assert database.job_fingerprint("manual", submission) == database.job_fingerprint(
+        "manual", reformatted
+    )
+
+
+def test_fingerprint_differs():
+    submission = make_submission()
+    other_residues = make_submission()
+    other_residues["residues"] = ["B19", "B23"]
+    no_rotamer_fix = make_submission()
+    no_rotamer_fix["rotamerFixActive"] = False
+    fingerprints = {
+        database.job_fingerprint("manual", submission),
+        database.job_fingerprint("manual", other_residues),
+        database.job_fingerprint("manual", no_rotamer_fix),
+        database.job_fingerprint("residues", {**submission, "constellationSize": 3}),
+    }
+    assert len(fingerprints) == 4
@@ -0,0 +1,125 @@
+"""Tests the checks run on job submissions by `bals.preflight`."""
+
+import pathlib
+
+import pytest
+
+from bals import preflight
+
+TESTS_DATA = pathlib.Path(__file__).parent.parent / "tests_data"
+
+
+def make_submission(job_type, pdb_code="1ycr", **fields):
+    """Creates a valid submission of a job type, with any fields replaced."""
+    submission = {
+        "name": f"{pdb_code} {job_type}",
+        "pdbFile": (TESTS_DATA / f"{pdb_code}.pdb").read_text(),
+        "receptor": ["A"],
+        "ligand": ["B"],
+        "rotamerFixActive": False,
+    }
+    if job_type in preflight.CONSTELLATION_MODES:
+        submission["scanName"] = pdb_code
+    if job_type == "auto":
+        submission.update(ddGCutOff=5.0, constellationSize=3, cutOffDistance=13.0)
+    elif job_type == "manual":
+        submission["residues"] = ["B19", "B23", "B26"]
+    elif job_type == "residues":
+        submission.update(residues=["B19", "B23", "B26"], constellationSize=2)
+    submission.update(fields)
+    return submission
+
+
+def renumber_residue(pdb_string, chain, number, new_number):
+    """Gives a residue a new number, with an insertion code, e.g. "19A"."""
+    lines = []
+    for line in pdb_string.splitlines():
+        if (
+            line.startswith("ATOM")
+            and line[21] == chain
+            and line[22:27].strip() == number
+        ):
+            line = line[:22] + f"{new_number:>5}" + line[27:]
+        lines.append(line)
+    return "\n".join(lines)
+
+
+@pytest.mark.parametrize("job_type", ["scan", "auto", "manual", "residues"])
+@pytest.mark.parametrize("pdb_code", ["1ycr", "1l8c"])
+def test_valid_submission(job_type, pdb_code):
+    submission = make_submission(job_type, pdb_code)
+    if pdb_code == "1l8c" and "residues" in submission:
+        submission["residues"] = ["B100", "B104", "B108"]
+    assert preflight.check_submission(job_type, submission) > 0
+
+
+def test_pdb_summary_models():
+    one_model = preflight.PdbSummary((TESTS_DATA / "1ycr.pdb").read_text())
+    ensemble = preflight.PdbSummary((TESTS_DATA / "1l8c.pdb").read_text())
+    assert one_model.model_count == 1
+    assert ensemble.model_count == 20
+    assert one_model.residues["B"] == {str(number) for number in range(17, 30)}
+
+
+def test_missing_chain():
+    submission = make_submission("scan", ligand=["C"])
+    with pytest.raises(preflight.PreflightError, match="Chain"):
+        preflight.check_submission("scan", submission)
+
+
+def test_receptor_and_ligand_overlap():
+    submission = make_submission("scan", receptor=["A", "B"])
+    with pytest.raises(preflight.PreflightError, match="share chains"):
+        preflight.check_submission("scan", submission)
+
+
+def test_residue_outside_ligand():
+    submission = make_submission("manual", residues=["A50", "B19"])
+    with pytest.raises(preflight.PreflightError, match="not a ligand chain"):
+        preflight.check_submission("manual", submission)
+
+
+def test_residue_not_in_chain():
+    submission = make_submission("manual", residues=["B99"])
+    with pytest.raises(preflight.PreflightError, match="could not be found"):
+        preflight.check_submission("manual", submission)
+
+
+def test_insertion_code_residue():
+    submission = make_submission("manual", residues=["B19A", "B23"])
+    submission["pdbFile"] = renumber_residue(submission["pdbFile"], "B", "20", "19A")
+    assert preflight.check_submission("manual", submission) > 0
+    submission["residues"] = ["B20"]
+    with pytest.raises(preflight.PreflightError, match="could not be found"):
+        preflight.check_submission("manual", submission)
+
+
+def test_constellation_size_larger_than_residues():
+    submission = make_submission("residues", constellationSize=4)
+    with pytest.raises(preflight.PreflightError, match="constellationSize"):
+        preflight.check_submission("residues", submission)
+
+
+def test_cost_cap():
+    submission = make_submission("scan")
+    estimated_cost = preflight.check_submission("scan", submission)
+    assert preflight.check_submission("scan", submission, estimated_cost) == (
+        estimated_cost
+    )
+    with pytest.raises(preflight.PreflightError, match="too large"):
+        preflight.check_submission("scan", submission, estimated_cost / 2)
+
+
+def test_cost_scales_with_models():
+    one_model = make_submission("scan", "1l8c")
+    one_model["pdbFile"] = one_model["pdbFile"].split("ENDMDL")[0]
+    ensemble = make_submission("scan", "1l8c")
+    assert preflight.check_submission("scan", ensemble) == pytest.approx(
+        20 * preflight.check_submission("scan", one_model)
+    )
+
+
+def test_check_batch_gives_index():
+    submissions = [make_submission("scan"), make_submission("scan", ligand=["C"])]
+    with pytest.raises(preflight.PreflightError, match="^Job 1: "):
+        preflight.check_batch("scan", submissions)
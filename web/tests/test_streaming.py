@@ -0,0 +1,96 @@
+"""Tests the streaming of job results from `bals.streaming`."""
+
+import asyncio
+import datetime
+import gzip
+import json
+import os
+import pathlib
+
+from bson.objectid import ObjectId
+
+os.environ.setdefault("BALAS_DB_NAME", "localhost")
+
+from bals import database, streaming  # noqa: E402
+
+TESTS_DATA = pathlib.Path(__file__).parent.parent / "tests_data"
+
+
+def make_completed_job():
+    """Creates a completed auto job document as the job manager stores it."""
+    scan_results = json.loads(
+        (TESTS_DATA / "replot" / "1ycrLig_auto_20171101114328_scan.json").read_text()
+    )
+    submitted = datetime.datetime(2026, 1, 5, 9, 30)
+    return {
+        "_id": ObjectId(),
+        "scanName": "1ycr",
+        "pdbFile": (TESTS_DATA / "1ycr.pdb").read_text(),
+        "receptor": ["A"],
+        "ligand": ["B"],
+        "ddGCutOff": 5.0,
+        "constellationSize": 3,
+        "cutOffDistance": 13.0,
+        "rotamerFixActive": True,
+        "submitter": "0123456789abcdef",
+        "fingerprint": "f" * 64,
+        "estimatedCost": 1.2,
+        "status": database.JobStatus.COMPLETED.value,
+        "timeSubmitted": submitted,
+        "timeStarted": submitted + datetime.timedelta(minutes=2),
+        "scanResults": scan_results,
+        "hotConstellations": [["B19_B23_B26", 42.1]],
+        "std_out": "Finished.\n",
+        "peakRssMB": 310.5,
+        "cpuSeconds": 95.2,
+        "wallSeconds": 101.7,
+        "archiveReady": True,
+        "archiveFile": "job.tar.zst",
+    }
+
+
+def stream(document, encoding=None):
+    async def collect():
+        return b"".join(
+            [chunk async for chunk in streaming.stream_json(document, encoding)]
+        )
+
+    return asyncio.run(collect())
+
+
+def test_stream_completed_job():
+    job = make_completed_job()
+    job_id = str(job["_id"])
+    body = json.loads(stream(database.export_job(job)))
+    assert body["_id"] == job_id
+    assert body["timeSubmitted"] == "2026-01-05 09:30:00"
+    assert body["timeStarted"] == "2026-01-05 09:32:00"
+    assert body["scanResults"]["pdb_id"] == "1ycrLig"
+    assert "submitter" not in body
+
+
+def test_stream_completed_job_gzip():
+    exported = database.export_job(make_completed_job())
+    assert gzip.decompress(stream(exported, "gzip")) == stream(exported)
+
+
+def test_stream_evicted_job():
+    job = make_completed_job()
+    job["lastDownloaded"] = datetime.datetime(2026, 2, 1, 12, 0)
+    job["archiveEvictedAt"] = datetime.datetime(2026, 5, 1, 3, 15)
+    job["archiveReady"] = False
+    job["archiveEvicted"] = True
+    body = json.loads(stream(database.export_job(job)))
+    assert body["lastDownloaded"] == "2026-02-01 12:00:00"
+    assert body["archiveEvictedAt"] == "2026-05-01 03:15:00"
+
+
+def test_projection_excludes_archive_fields():
+    assert streaming.make_projection(None) == {
+        field: 0 for field in streaming.MUTABLE_FIELDS
+    }
+    assert streaming.make_projection(["archiveReady", "scanResults.dG"]) == {
+        "scanResults.dG": 1,
+        "_id": 1,
+        "status": 1,
+    }